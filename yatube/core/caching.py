@@ -0,0 +1,271 @@
+"""Общий для всех процессов кэш и защита от лавины промахов.
+
+SQLiteCache - бэкенд кэша Django поверх отдельного файла SQLite.
+Все процессы сервера видят одни и те же записи, поэтому промах
+и пересборка страницы происходят один раз, а не в каждом воркере.
+Интерфейс стандартный, так что в продакшене бэкенд заменяется на
+Redis или Memcached настройкой CACHE_BACKEND без изменений кода.
+
+get_or_set_coalesced - чтение с ранним вероятностным пересчетом
+(XFetch) и блокировкой: значение пересобирает только один процесс,
+остальные в это время получают предыдущее значение.
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core.metrics import record_cache
+
+CULL_CHECK_EVERY: int = 100
+LOCK_TIMEOUT: int = 30
+LOCK_POLL_INTERVAL: float = 0.05
+STALE_FACTOR: int = 2
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов сервера."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = os.path.abspath(location)
+        self._local = threading.local()
+        self._sets = 0
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=LOCK_TIMEOUT, isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        # Целые числа храним без pickle: их читают счетчики поколений.
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _loads(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (
+                self._key(key, version), self._dumps(value),
+                self.get_backend_timeout(timeout), time.time(),
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        row = self._connection.execute(
+            'SELECT value FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        if row is None:
+            return default
+        return self._loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()),
+        )
+        return {keys[key]: self._loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (
+                self._key(key, version), self._dumps(value),
+                self.get_backend_timeout(timeout),
+            ),
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [
+                    (self._key(key, version), self._dumps(value), expires)
+                    for key, value in data.items()
+                ],
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._maybe_cull()
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version), time.time(),
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),),
+        )
+
+    def delete_many(self, keys, version=None):
+        self._connection.executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys],
+        )
+
+    def has_key(self, key, version=None):
+        return self._connection.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key),
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живет столько же, сколько поток: открывать файл
+        # на каждый запрос дороже, чем держать его открытым.
+        pass
+
+    def _maybe_cull(self):
+        self._sets += 1
+        if self._sets % CULL_CHECK_EVERY == 0:
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (time.time(),),
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+
+def get_or_set_coalesced(key, builder, timeout, cache=default_cache, beta=1.0):
+    """Возвращает значение из кэша, пересобирая его не более чем одним
+    процессом одновременно.
+
+    Вместе со значением хранится время его сборки. Чем ближе срок
+    годности и чем дольше сборка, тем выше шанс, что очередной запрос
+    пересоберет значение заранее (XFetch). Пересборку выполняет тот,
+    кто взял блокировку; остальные отдают предыдущее значение, а если
+    его нет - ждут результата сборщика.
+
+    Исход обращения (hit, stale или miss) учитывается в метриках запроса.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None:
+        value, expires, delta = entry
+        if now - delta * beta * math.log(1 - random.random()) < expires:
+            record_cache('hit')
+            return value
+
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            record_cache('stale')
+            return entry[0]
+        deadline = now + LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                record_cache('hit')
+                return entry[0]
+
+    record_cache('miss')
+    try:
+        started = time.time()
+        value = builder()
+        finished = time.time()
+        cache.set(
+            key, (value, finished + timeout, finished - started),
+            timeout * STALE_FACTOR,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
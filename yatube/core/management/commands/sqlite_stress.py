@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест SQLite: параллельные лайки и чтение ленты '
+        'без настройки соединений и с SQLITE_PRAGMAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stress.sqlite3')
+            for name, pragmas in (
+                ('Без настройки', {}),
+                ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS),
+            ):
+                result = sqlite.stress(
+                    path, pragmas, writers=options['writers'],
+                    readers=options['readers'], duration=options['duration'],
+                )
+                self.stdout.write(
+                    f'{name}: записей {result["writes_per_second"]}/с, '
+                    f'чтений {result["reads_per_second"]}/с, '
+                    f'ошибок блокировки {result["locked"]}'
+                )
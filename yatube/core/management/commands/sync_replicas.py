@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик DB_REPLICAS. '
+        'Заменяет репликацию при локальной проверке чтения с реплик; '
+        'с --every повторяет копирование, изображая отставание реплик.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float, default=0,
+            help='Повторять копирование каждые N секунд.',
+        )
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        primary = databases[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: укажите DB_REPLICAS.')
+        while True:
+            source = sqlite3.connect(primary['NAME'])
+            try:
+                for alias in settings.DATABASE_REPLICAS:
+                    target = sqlite3.connect(databases[alias]['NAME'])
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            self.stdout.write(self.style.SUCCESS(
+                f'Скопировано в реплики: {len(settings.DATABASE_REPLICAS)}.'
+            ))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,250 @@
+"""Метрики производительности в формате Prometheus.
+
+Каждый процесс копит гистограммы и счетчики в памяти и раз
+в METRICS_FLUSH_INTERVAL секунд прибавляет их к общему файлу SQLite
+METRICS_LOCATION. Поэтому /metrics отдает сумму по всем процессам
+сервера, в какой бы из них ни пришел запрос сборщика. Так же устроен
+мультипроцессный режим prometheus_client, но без лишней зависимости.
+
+RequestMetrics - замеры текущего запроса: время SQL, число запросов,
+время отрисовки шаблонов и попадания в кэш. Их заполняют обертка
+execute_wrapper, InstrumentedTemplates и get_or_set_coalesced, а
+MetricsMiddleware переносит их в гистограммы и заголовок Server-Timing.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+LOCK_TIMEOUT: int = 30
+
+HELP = {
+    'yatube_request_duration_seconds': 'Полное время обработки запроса.',
+    'yatube_db_duration_seconds': 'Время SQL-запросов за один запрос.',
+    'yatube_db_queries': 'Число SQL-запросов за один запрос.',
+    'yatube_template_render_seconds': 'Время отрисовки шаблонов.',
+    'yatube_cache_requests_total': 'Обращения к кэшу страниц.',
+    'yatube_responses_total': 'Ответы по кодам статуса.',
+    'yatube_task_duration_seconds': 'Время выполнения фоновых задач.',
+}
+
+
+class RequestMetrics:
+    """Замеры одного HTTP-запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = defaultdict(int)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, total):
+        cache = ' '.join(
+            f'{result}={count}' for result, count in sorted(self.cache.items())
+        )
+        entries = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if cache:
+            entries.insert(2, f'cache;desc="{cache}"')
+        return ', '.join(entries)
+
+
+_local = threading.local()
+
+
+def current():
+    """Замеры обрабатываемого в этом потоке запроса или None."""
+    return getattr(_local, 'metrics', None)
+
+
+def start_request():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def finish_request():
+    _local.metrics = None
+
+
+def record_cache(result):
+    """Учитывает обращение к кэшу: hit, stale или miss."""
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[result] += 1
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    """Метрики процесса и их общий для процессов файл."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._samples = defaultdict(float)
+        self._flushed = time.monotonic()
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        """Добавляет наблюдение в гистограмму name."""
+        labels = tuple(labels.items())
+        with self._lock:
+            for bound in (*buckets, math.inf):
+                if value <= bound:
+                    key = (name, '_bucket', labels + (('le', bound),))
+                    self._samples[key] += 1
+            self._samples[(name, '_sum', labels)] += value
+            self._samples[(name, '_count', labels)] += 1
+
+    def inc(self, name, labels, amount=1):
+        """Увеличивает счетчик name."""
+        with self._lock:
+            self._samples[(name, '', tuple(labels.items()))] += amount
+
+    @property
+    def _connection(self):
+        path = os.path.abspath(settings.METRICS_LOCATION)
+        connections = self._local.__dict__.setdefault('connections', {})
+        if path not in connections:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(
+                path, timeout=LOCK_TIMEOUT, isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'name TEXT, suffix TEXT, labels TEXT, le REAL, '
+                'value REAL NOT NULL, PRIMARY KEY (name, suffix, labels, le))'
+            )
+            connections[path] = connection
+        return connections[path]
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Прибавляет накопленные значения к общему файлу метрик."""
+        with self._lock:
+            samples, self._samples = self._samples, defaultdict(float)
+            self._flushed = time.monotonic()
+        if not samples:
+            return
+        rows = []
+        for (name, suffix, labels), value in samples.items():
+            le = dict(labels).get('le', -1)
+            labels = format_labels(
+                (label, text) for label, text in labels if label != 'le'
+            )
+            rows.append((name, suffix, labels, le, value))
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO samples (name, suffix, labels, le, value) '
+                'VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (name, suffix, labels, le) '
+                'DO UPDATE SET value = value + excluded.value',
+                rows,
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def exposition(self):
+        """Все метрики в текстовом формате Prometheus."""
+        self.flush()
+        rows = self._connection.execute(
+            'SELECT name, suffix, labels, le, value FROM samples '
+            'ORDER BY name, labels, suffix, le'
+        )
+        lines = []
+        family = None
+        for name, suffix, labels, le, value in rows:
+            if name != family:
+                family = name
+                kind = 'counter' if name.endswith('_total') else 'histogram'
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} {kind}')
+            if le != -1:
+                le_label = f'le="{format_value(le)}"'
+                labels = f'{labels},{le_label}' if labels else le_label
+            labels = f'{{{labels}}}' if labels else ''
+            lines.append(f'{name}{suffix}{labels} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+        self._connection.execute('DELETE FROM samples')
+
+
+registry = Registry()
+
+
+class InstrumentedTemplate:
+    """Шаблон, учитывающий время своей отрисовки в RequestMetrics."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return self.template.render(context, request)
+        # Вложенные шаблоны отрисовываются внутри внешнего: их время
+        # уже входит в его время.
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Шаблонизатор Django с замером времени отрисовки."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
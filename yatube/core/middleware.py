@@ -0,0 +1,137 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, routers
+from core.queries import QueryLog, budget_of
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class QueryInspectorMiddleware:
+    """Записывает SQL-запросы каждого HTTP-запроса и сообщает о N+1
+    и о превышении бюджета запросов представления.
+
+    Журнал запросов доступен тестам как response.query_log.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_budget = None
+        query_log = QueryLog()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(query_log),
+                )
+            response = self.get_response(request)
+        response.query_log = query_log
+
+        report = query_log.report()
+        if report:
+            logger.warning(
+                'Повторяющиеся запросы (N+1) на %s:\n%s', request.path, report,
+            )
+        budget = request.query_budget
+        if budget is not None and len(query_log) > budget:
+            logger.warning(
+                'Запросов к базе на %s: %d при бюджете %d',
+                request.path, len(query_log), budget,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = budget_of(view_func)
+
+
+class MetricsMiddleware:
+    """Замеряет время запроса, SQL, шаблонов и обращения к кэшу.
+
+    Замеры попадают в гистограммы /metrics с меткой представления
+    и в заголовок Server-Timing ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(request_metrics),
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        total = time.perf_counter() - request_metrics.started
+        response['Server-Timing'] = request_metrics.server_timing(total)
+
+        match = request.resolver_match
+        view = {'view': match.view_name if match else 'unmatched'}
+        registry = metrics.registry
+        registry.observe(
+            'yatube_request_duration_seconds',
+            {**view, 'method': request.method}, total,
+        )
+        registry.observe(
+            'yatube_db_duration_seconds', view, request_metrics.db_time,
+        )
+        registry.observe(
+            'yatube_db_queries', view, request_metrics.queries,
+            metrics.QUERY_BUCKETS,
+        )
+        registry.observe(
+            'yatube_template_render_seconds', view,
+            request_metrics.template_time,
+        )
+        for result, count in request_metrics.cache.items():
+            registry.inc(
+                'yatube_cache_requests_total', {**view, 'result': result},
+                count,
+            )
+        registry.inc(
+            'yatube_responses_total',
+            {**view, 'status': str(response.status_code)},
+        )
+        registry.maybe_flush()
+        return response
+
+
+class ReplicaMiddleware:
+    """Разрешает безопасным запросам читать с реплик.
+
+    Запросы, изменяющие данные, и запросы пользователя, который недавно
+    что-то записал, читают из основной базы: об этом помнит cookie,
+    выставленная после записи на REPLICA_PIN_SECONDS секунд.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request(
+            replica_reads=(
+                request.method in SAFE_METHODS
+                and PRIMARY_COOKIE not in request.COOKIES
+            ),
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish_request()
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,122 @@
+"""Учет SQL-запросов при обработке HTTP-запроса.
+
+QueryLog записывает каждый запрос к базе вместе с местом, откуда он
+выполнен: строкой шаблона и ближайшим кадром кода проекта. Запросы
+группируются по нормализованному SQL, и форма, повторенная
+QUERY_REPEAT_THRESHOLD раз и больше, считается признаком N+1.
+
+Представления объявляют максимальное число запросов декоратором
+query_budget; бюджет проверяют тесты и QueryInspectorMiddleware.
+"""
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+SKIPPED_FILES = (
+    os.path.join(CORE_DIR, 'queries.py'),
+    os.path.join(CORE_DIR, 'middleware.py'),
+    os.path.join(CORE_DIR, 'metrics.py'),
+)
+
+
+def query_budget(limit):
+    """Декоратор, объявляющий максимальное число запросов представления."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_of(view):
+    """Бюджет запросов функции или класса представления."""
+    view = getattr(view, 'view_class', view)
+    return getattr(view, 'query_budget', None)
+
+
+def normalize(sql):
+    """Приводит запросы одной формы к одинаковому тексту."""
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = NUMBER.sub('?', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def query_origin():
+    """Строка шаблона и кадр кода проекта, выполнившие запрос."""
+    template_line = code_line = None
+    frame = sys._getframe(1)
+    while frame is not None and not (template_line and code_line):
+        code = frame.f_code
+        if template_line is None and code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                template_line = f'{origin.name}:{token.lineno}'
+        filename = code.co_filename
+        if (
+            code_line is None
+            and filename.startswith(settings.BASE_DIR)
+            and 'site-packages' not in filename
+            and filename not in SKIPPED_FILES
+        ):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            code_line = f'{path}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return ', '.join(filter(None, (template_line, code_line))) or '?'
+
+
+class QueryLog:
+    """Обертка execute_wrapper, записывающая выполненные запросы."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': normalize(sql),
+                'origin': query_origin(),
+                'time': time.perf_counter() - started,
+            })
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=None):
+        """Формы запросов, выполненные не меньше threshold раз."""
+        if threshold is None:
+            threshold = settings.QUERY_REPEAT_THRESHOLD
+        shapes = Counter(query['sql'] for query in self.queries)
+        return [
+            {
+                'sql': sql,
+                'count': count,
+                'origins': Counter(
+                    query['origin'] for query in self.queries
+                    if query['sql'] == sql
+                ),
+            }
+            for sql, count in shapes.most_common() if count >= threshold
+        ]
+
+    def report(self, threshold=None):
+        """Текстовый отчет о повторяющихся запросах."""
+        lines = []
+        for shape in self.repeated(threshold):
+            lines.append(f'{shape["count"]} x {shape["sql"]}')
+            lines.extend(
+                f'    {count} x {origin}'
+                for origin, count in shape['origins'].most_common()
+            )
+        return '\n'.join(lines)
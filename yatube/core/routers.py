@@ -0,0 +1,79 @@
+"""Чтение с реплик и запись в основную базу.
+
+ReplicaRouter отправляет все записи в основную базу, а чтение - на одну
+из реплик DATABASE_REPLICAS, но только там, где это разрешено:
+в безопасных (GET, HEAD) HTTP-запросах, которые отметил
+ReplicaMiddleware. Консольные команды, фоновые задачи, запросы,
+изменяющие данные, и код внутри транзакции читают из основной базы.
+
+Реплики отстают от основной базы. Чтобы пользователь сразу видел свою
+публикацию, комментарий или лайк, после записи ReplicaMiddleware
+ставит cookie, и следующие REPLICA_PIN_SECONDS секунд его запросы
+читают из основной базы (read-your-writes).
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def start_request(replica_reads):
+    """Начинает HTTP-запрос; replica_reads разрешает чтение с реплик."""
+    _state.replica_reads = replica_reads
+    _state.replica = None
+    _state.wrote = False
+
+
+def finish_request():
+    """Завершает HTTP-запрос и сообщает, была ли в нем запись."""
+    wrote = getattr(_state, 'wrote', False)
+    start_request(replica_reads=False)
+    return wrote
+
+
+@contextmanager
+def use_primary():
+    """Контекст и декоратор: все чтение внутри идет из основной базы."""
+    previous = getattr(_state, 'replica_reads', False)
+    _state.replica_reads = False
+    try:
+        yield
+    finally:
+        _state.replica_reads = previous
+
+
+class ReplicaRouter:
+    """Маршрутизатор основной базы и реплик только для чтения."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or not getattr(_state, 'replica_reads', False)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        # Одна реплика на весь HTTP-запрос: страницы и счетчики
+        # читаются из одного и того же состояния базы.
+        if _state.replica is None:
+            _state.replica = random.choice(replicas)
+        return _state.replica
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
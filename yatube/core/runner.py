@@ -0,0 +1,39 @@
+"""Запуск тестов с отдельным кэшем.
+
+Тесты очищают кэш, а кэш по умолчанию - общий файл SQLite рядом
+с базой. Чтобы тесты не стирали журнал лайков, поколения лент и прочие
+данные работающего сервера, на время прогона кэш переключается
+на временный файл того же бэкенда.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    """DiscoverRunner, подменяющий CACHES временным SQLiteCache."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp(prefix='yatube-cache-')
+        caches = {
+            alias: {
+                **config,
+                'BACKEND': 'core.caching.SQLiteCache',
+                'LOCATION': os.path.join(
+                    self.cache_directory, f'{alias}.sqlite3',
+                ),
+            }
+            for alias, config in settings.CACHES.items()
+        }
+        self.cache_override = override_settings(CACHES=caches)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
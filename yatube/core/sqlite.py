@@ -0,0 +1,145 @@
+"""Настройка соединений SQLite для параллельной записи и чтения.
+
+Без настройки SQLite пишет журнал отката и синхронизирует диск при
+каждой фиксации, а читатели и писатели блокируют друг друга: лайки
+и комментарии, пришедшие одновременно, падают с «database is locked».
+tune() выполняет SQLITE_PRAGMAS на каждом новом соединении Django:
+
+- journal_mode=WAL: читатели не ждут писателя, а писатель - читателей;
+- synchronous=NORMAL: в режиме WAL диск синхронизируется только при
+  контрольных точках, данные не портятся и при сбое питания;
+- busy_timeout: занятая база ожидается, а не сразу дает ошибку;
+- mmap_size и cache_size: страницы читаются через отображение файла
+  в память и кэшируются в процессе;
+- temp_store=MEMORY: временные таблицы сортировок не пишутся на диск.
+
+stress() сравнивает пропускную способность записи при параллельном
+чтении с настройками и без них; его запускает команда sqlite_stress.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+STRESS_POSTS: int = 1000
+STRESS_PAGE: int = 10
+
+
+def apply_pragmas(db, pragmas):
+    """Выполняет PRAGMA из словаря на соединении sqlite3."""
+    for name, value in pragmas.items():
+        db.execute(f'PRAGMA {name} = {value}')
+
+
+def tune(sender, connection, **kwargs):
+    """Обработчик connection_created: настраивает соединение SQLite.
+
+    PRAGMA выполняются на соединении sqlite3 напрямую, мимо оберток
+    execute_wrapper: в метрики и бюджеты запросов они не попадают.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
+
+
+def create_stress_schema(path):
+    db = sqlite3.connect(path)
+    db.executescript(
+        'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+        'likes_count INTEGER NOT NULL DEFAULT 0);'
+        'CREATE TABLE "like" (id INTEGER PRIMARY KEY, post_id INTEGER, '
+        'user_id INTEGER);'
+        'CREATE INDEX like_post ON "like" (post_id);'
+    )
+    db.executemany(
+        'INSERT INTO post (text) VALUES (?)',
+        [(f'Публикация {i}',) for i in range(STRESS_POSTS)],
+    )
+    db.commit()
+    db.close()
+
+
+def stress(path, pragmas, writers=4, readers=4, duration=2.0):
+    """Параллельные лайки и чтение ленты в течение duration секунд.
+
+    Писатель в одной транзакции добавляет лайк и увеличивает счетчик
+    публикации, как LikeView. Читатель выбирает страницу ленты с числом
+    лайков. Возвращает число записей, чтений и ошибок блокировки.
+    """
+    for name in (path, f'{path}-wal', f'{path}-shm'):
+        if os.path.exists(name):
+            os.remove(name)
+    create_stress_schema(path)
+    totals = {'writes': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def count(key):
+        with lock:
+            totals[key] += 1
+
+    def open_db():
+        # Как Django: 5 секунд ожидания блокировки по умолчанию,
+        # транзакции открываются явно.
+        db = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(db, pragmas)
+        return db
+
+    def write(number):
+        db = open_db()
+        post_id = 0
+        while time.monotonic() < deadline:
+            post_id = (post_id + 7) % STRESS_POSTS + 1
+            try:
+                db.execute('BEGIN')
+                db.execute(
+                    'INSERT INTO "like" (post_id, user_id) VALUES (?, ?)',
+                    (post_id, number),
+                )
+                db.execute(
+                    'UPDATE post SET likes_count = likes_count + 1 '
+                    'WHERE id = ?', (post_id,),
+                )
+                db.execute('COMMIT')
+                count('writes')
+            except sqlite3.OperationalError:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                count('locked')
+        db.close()
+
+    def read(number):
+        db = open_db()
+        while time.monotonic() < deadline:
+            try:
+                db.execute('BEGIN')
+                db.execute(
+                    'SELECT id, text, likes_count FROM post '
+                    'ORDER BY id DESC LIMIT ? OFFSET ?',
+                    (STRESS_PAGE, number * STRESS_PAGE),
+                ).fetchall()
+                db.execute('SELECT COUNT(*) FROM "like"').fetchone()
+                db.execute('COMMIT')
+                count('reads')
+            except sqlite3.OperationalError:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                count('locked')
+        db.close()
+
+    threads = [
+        threading.Thread(target=write, args=(number,))
+        for number in range(writers)
+    ] + [
+        threading.Thread(target=read, args=(number,))
+        for number in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    totals['writes_per_second'] = round(totals['writes'] / duration, 1)
+    totals['reads_per_second'] = round(totals['reads'] / duration, 1)
+    return totals
@@ -0,0 +1,140 @@
+"""Стеммер Snowball для русского языка.
+
+Отрезает от слова окончания и суффиксы, чтобы разные формы слова
+(«книга», «книги», «книгами») приводились к одной основе. Реализация
+повторяет алгоритм https://snowballstem.org/algorithms/russian/stemmer.html
+и не требует внешних библиотек.
+"""
+VOWELS = frozenset('аеиоуыэюя')
+
+# Окончания групп, помеченные в алгоритме как «после а или я»,
+# отрезаются, только если перед ними стоит одна из этих букв.
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+        'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых',
+        'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+    ),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи',
+        'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием',
+        'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию',
+        'ью', 'ю', 'ия', 'ья', 'я',
+    ),
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def regions(word):
+    """Начала областей RV и R2 слова."""
+    rv = r1 = r2 = len(word)
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def cut(rv, endings):
+    """Отрезает самое длинное окончание группы или возвращает None.
+
+    Как и в Snowball, выбирается самое длинное подходящее окончание;
+    если его условие не выполнено, более короткие не проверяются.
+    """
+    after_a, plain = endings
+    found = max(
+        (ending for ending in (*after_a, *plain) if rv.endswith(ending)),
+        key=len, default=None,
+    )
+    if found is None:
+        return None
+    stem = rv[:-len(found)]
+    if found in plain:
+        return stem
+    if stem[-1:] in ('а', 'я'):
+        return stem
+    return None
+
+
+def stem(word):
+    """Основа русского слова; слова без гласных возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    rv_start, r2_start = regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастие, иначе возвратная частица и затем
+    # прилагательное (причастие), глагол или существительное.
+    result = cut(rv, PERFECTIVE_GERUND)
+    if result is None:
+        reflexive = cut(rv, REFLEXIVE)
+        if reflexive is not None:
+            rv = reflexive
+        result = cut(rv, ADJECTIVE)
+        if result is not None:
+            participle = cut(result, PARTICIPLE)
+            result = result if participle is None else participle
+        else:
+            result = cut(rv, VERB)
+            if result is None:
+                result = cut(rv, NOUN)
+    if result is not None:
+        rv = result
+
+    # Шаг 2.
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс в области R2.
+    for ending in DERIVATIONAL:
+        start = rv_start + len(rv) - len(ending)
+        if rv.endswith(ending) and start >= r2_start:
+            rv = rv[:-len(ending)]
+            break
+
+    # Шаг 4.
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        for ending in SUPERLATIVE:
+            if rv.endswith(ending):
+                rv = rv[:-len(ending)]
+                if rv.endswith('нн'):
+                    rv = rv[:-1]
+                break
+        else:
+            if rv.endswith('ь'):
+                rv = rv[:-1]
+    return prefix + rv
@@ -0,0 +1,80 @@
+"""Фоновое выполнение задач вне цикла запроса.
+
+Задача ставится в очередь только после фиксации транзакции, чтобы
+фоновый поток видел сохраненные данные. Число потоков задается
+настройкой BACKGROUND_WORKERS; при 0 задачи выполняются сразу
+в текущем потоке, что удобно для отладки и консольных команд.
+Отложенные задачи submit_later() ждут своего срока в потоке-таймере
+при любом BACKGROUND_WORKERS.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core.metrics import registry
+from core.routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='background',
+            )
+    return _executor
+
+
+def run(func, *args):
+    """Выполняет задачу, записывая ошибку в журнал вместо падения."""
+    started = time.perf_counter()
+    try:
+        # Задача выполняется сразу после фиксации транзакции, и реплики
+        # могут еще не знать о только что записанных данных.
+        with use_primary():
+            func(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась с ошибкой', func)
+    registry.observe(
+        'yatube_task_duration_seconds',
+        {'task': f'{func.__module__}.{func.__qualname__}'},
+        time.perf_counter() - started,
+    )
+
+
+def run_in_worker(func, *args):
+    run(func, *args)
+    # Соединения с базой у каждого потока свои: закрываем их,
+    # чтобы не держать открытыми между задачами.
+    connections.close_all()
+
+
+def submit(func, *args):
+    """Выполняет func(*args) в фоне после фиксации текущей транзакции."""
+    def enqueue():
+        if settings.BACKGROUND_WORKERS:
+            get_executor().submit(run_in_worker, func, *args)
+        else:
+            run(func, *args)
+
+    transaction.on_commit(enqueue)
+
+
+def submit_later(delay, func, *args):
+    """Выполняет func(*args) через delay секунд после фиксации транзакции."""
+    def enqueue():
+        timer = threading.Timer(delay, run_in_worker, (func, *args))
+        timer.daemon = True
+        timer.start()
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,48 @@
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Library, Node, TemplateSyntaxError
+
+from core.caching import get_or_set_coalesced
+
+register = Library()
+
+
+class FragmentCacheNode(Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        expire_time = int(self.expire_time.resolve(context))
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        cache_key = make_template_fragment_key(self.fragment_name, vary_on)
+        return get_or_set_coalesced(
+            cache_key,
+            lambda: self.nodelist.render(context),
+            expire_time,
+            cache=caches['default'],
+        )
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """Кэширует фрагмент шаблона с защитой от лавины промахов.
+
+    Синтаксис совпадает со стандартным тегом cache:
+    {% fragment_cache [expire_time] [fragment_name] [var1] [var2] .. %}
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(bit) for bit in tokens[3:]],
+    )
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.test import SimpleTestCase
+
+from core.caching import SQLiteCache, get_or_set_coalesced
+
+
+class TestCacheIsolationTests(SimpleTestCase):
+    """Тесты не трогают общий кэш сервера."""
+
+    def test_temporary_cache(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            location, os.path.join(settings.BASE_DIR, 'cache.sqlite3'),
+        )
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """Тестирование кэша в файле SQLite."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = SQLiteCache(f'{self.cache_dir}/cache.sqlite3', {})
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Базовые операции кэша."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertEqual(
+            self.cache.get_many(['key', 'missing']),
+            {'key': {'value': [1, 2]}},
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_value(self):
+        """Просроченное значение не возвращается и может быть заменено."""
+        self.cache.set('key', 'old', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new', DEFAULT_TIMEOUT))
+        self.assertFalse(self.cache.add('key', 'newer', DEFAULT_TIMEOUT))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_shared_between_connections(self):
+        """Записи видны из другого экземпляра бэкенда (процесса)."""
+        other = SQLiteCache(f'{self.cache_dir}/cache.sqlite3', {})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+
+    def test_incr_is_atomic(self):
+        """Параллельные incr не теряют приращений."""
+        self.cache.set('counter', 0, None)
+
+        def increment():
+            for _ in range(50):
+                self.cache.incr('counter')
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class CoalescedGetTests(SimpleTestCase):
+    """Тестирование защиты от лавины промахов."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = SQLiteCache(f'{self.cache_dir}/cache.sqlite3', {})
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_value_is_built_once(self):
+        """Свежее значение не пересобирается."""
+        builder = mock.Mock(return_value='page')
+        for _ in range(3):
+            value = get_or_set_coalesced(
+                'key', builder, 60, cache=self.cache, beta=0,
+            )
+        self.assertEqual(value, 'page')
+        builder.assert_called_once()
+
+    def test_stale_value_served_while_rebuilding(self):
+        """Пока другой процесс пересобирает значение, отдается старое."""
+        self.cache.set('key', ('old page', 0, 0))
+        self.cache.add('key:lock', 1, 30)
+        builder = mock.Mock(return_value='new page')
+        value = get_or_set_coalesced('key', builder, 60, cache=self.cache)
+        self.assertEqual(value, 'old page')
+        builder.assert_not_called()
+
+    def test_expired_value_rebuilt(self):
+        """Истекшее значение пересобирает взявший блокировку."""
+        self.cache.set('key', ('old page', 0, 0))
+        value = get_or_set_coalesced(
+            'key', lambda: 'new page', 60, cache=self.cache,
+        )
+        self.assertEqual(value, 'new page')
+        self.assertFalse(self.cache.has_key('key:lock'))
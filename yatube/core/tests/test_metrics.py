@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    METRICS_LOCATION=f'{TEMP_METRICS_DIR}/metrics.sqlite3',
+    METRICS_FLUSH_INTERVAL=0,
+    METRICS_TOKEN=None,
+)
+class MetricsTests(TestCase):
+    """Тестирование заголовка Server-Timing и метрик /metrics."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def test_server_timing(self):
+        """Ответ содержит время SQL, шаблонов, кэша и общее время."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for entry in ('db;dur=', 'queries"', 'tpl;dur=', 'total;dur='):
+            self.assertIn(entry, timing)
+        self.assertIn('cache;desc="miss=', timing)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('cache;desc="hit=', response['Server-Timing'])
+
+    @override_settings(DEBUG=True)
+    def test_exposition(self):
+        """Гистограммы собраны по представлениям в формате Prometheus."""
+        self.client.get(reverse('posts:index'))
+        self.client.get('/missing-page/')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn(
+            '# TYPE yatube_request_duration_seconds histogram', text,
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",method="GET",le="+Inf"} 1', text,
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",method="GET"} 1', text,
+        )
+        self.assertIn('yatube_db_queries_bucket{view="posts:index"', text)
+        self.assertIn('yatube_template_render_seconds_sum', text)
+        self.assertIn(
+            'yatube_cache_requests_total{view="posts:index",result="miss"}',
+            text,
+        )
+        self.assertIn(
+            'yatube_responses_total{view="unmatched",status="404"} 1', text,
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        """С заданным токеном метрики отдаются только сборщику."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_closed_without_token(self):
+        """Без токена и без DEBUG метрики недоступны."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
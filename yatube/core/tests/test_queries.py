@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.template import engines
+from django.test import TestCase
+
+from core.queries import QueryLog, normalize
+
+User = get_user_model()
+
+
+class QueryLogTests(TestCase):
+    """Тестирование журнала запросов и поиска N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            User.objects.create_user(username=f'user_{i}')
+
+    def test_normalize(self):
+        """Запросы одной формы нормализуются одинаково."""
+        self.assertEqual(
+            normalize('SELECT * FROM t WHERE id IN (%s, %s)  LIMIT 21'),
+            normalize('SELECT * FROM t WHERE id IN (%s) LIMIT 10'),
+        )
+
+    def test_repeated_queries_point_to_template_line(self):
+        """Повторяющиеся запросы из шаблона указывают на его строку."""
+        template = engines['django'].from_string(
+            '{% for user in users %}\n{{ user.groups.count }}{% endfor %}'
+        )
+        query_log = QueryLog()
+        with connection.execute_wrapper(query_log):
+            template.render({'users': User.objects.all()})
+        self.assertEqual(len(query_log), 4)
+        repeated = query_log.repeated()
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['count'], 3)
+        origin = next(iter(repeated[0]['origins']))
+        self.assertTrue(origin.startswith('<unknown source>:2'), origin)
+        self.assertIn('core/tests/test_queries.py', origin)
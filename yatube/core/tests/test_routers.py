@@ -0,0 +1,62 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import routers
+from core.middleware import PRIMARY_COOKIE, ReplicaMiddleware
+from posts.models import Post
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTests(SimpleTestCase):
+    """Тестирование чтения с реплик и привязки к основной базе."""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def tearDown(self):
+        routers.finish_request()
+
+    def view(self, write=False):
+        def get_response(request):
+            self.reads.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+        return ReplicaMiddleware(get_response)
+
+    def test_outside_request(self):
+        """Вне HTTP-запроса чтение идет из основной базы."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_safe_request_reads_replica(self):
+        """GET читает с реплики и не ставит cookie без записи."""
+        response = self.view()(self.factory.get('/'))
+        self.assertEqual(self.reads, ['replica'])
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_write_pins_reads(self):
+        """После записи запросы пользователя читают из основной базы."""
+        response = self.view(write=True)(self.factory.post('/'))
+        self.assertEqual(self.reads, ['default'])
+        cookie = response.cookies[PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES[PRIMARY_COOKIE] = cookie.value
+        self.view()(request)
+        self.assertEqual(self.reads, ['default', 'default'])
+
+    def test_use_primary(self):
+        """use_primary возвращает чтение в основную базу."""
+        routers.start_request(replica_reads=True)
+        with routers.use_primary():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_replicas_are_not_migrated(self):
+        """Миграции применяются только к основной базе."""
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
@@ -0,0 +1,46 @@
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from core import sqlite
+
+
+class SQLiteTuningTests(TestCase):
+    """Тестирование настройки соединений SQLite."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_connection_is_tuned(self):
+        """PRAGMA из настроек применены к соединению Django."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'],
+            )
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_stress(self):
+        """С настройкой запись при параллельном чтении идет без блокировок.
+
+        Сравнение скорости с настройкой и без нее выводит команда
+        sqlite_stress: в тестах время выполнения зависит от нагрузки
+        на машину.
+        """
+        path = f'{self.directory}/stress.sqlite3'
+        tuned = sqlite.stress(path, settings.SQLITE_PRAGMAS, duration=0.5)
+        self.assertEqual(tuned['locked'], 0)
+        self.assertGreater(tuned['writes'], 0)
+        self.assertGreater(tuned['reads'], 0)
+        db = sqlite3.connect(path)
+        journal_mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+        db.close()
+        self.assertEqual(journal_mode, 'wal')
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 
+from core.metrics import registry
+
 
 def page_not_found(request, exception):
     """Отображение ошибки 404 - страница не существует."""
@@ -21,3 +25,19 @@ def permission_denied(request, exception):
 def server_error(request):
     """Отображение ошибки 500 - ошибка сервера."""
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """Метрики производительности в текстовом формате Prometheus.
+
+    Без METRICS_TOKEN метрики открыты только при DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
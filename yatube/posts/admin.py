@@ -1,20 +1,145 @@
 from django.contrib import admin
+from django.db.models import F, Q, Sum
+from django.template.defaultfilters import filesizeformat
 
-from .models import Comment, Follow, Group, Post, Like
+from . import search
+from .models import Comment, Follow, Group, ImageVariant, Post, Like
+from .utils import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список больших таблиц без полных проходов по ним.
+
+    Число строк без фильтров оценивается, а не считается, и второй
+    COUNT(*) для «показать все» не выполняется. Поиск идет только
+    точными совпадениями по индексированным полям exact_search_fields:
+    LIKE '%...%' по search_fields прочитал бы таблицу целиком.
+    Поля с суффиксом pk или _id ищутся только по числам.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    exact_search_fields = ()
+
+    def exact_search(self, search_term):
+        query = Q()
+        for lookup in self.exact_search_fields:
+            if lookup.endswith(('pk', '_id')) and not search_term.isdigit():
+                continue
+            query |= Q(**{lookup: search_term})
+        return query
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = self.exact_search(search_term)
+        if not query:
+            return queryset.none(), False
+        return queryset.filter(query), False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    """ Настройки отображения модели Post на странице администрирования."""
+class PostAdmin(LargeTableAdmin):
+    """ Настройки отображения модели Post на странице администрирования.
+
+    Текст ищется через полнотекстовый индекс posts.search, номер
+    публикации и имя автора - точным совпадением.
+    """
 
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
+    exact_search_fields = ('pk', 'author__username')
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    autocomplete_fields = ('author',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = self.exact_search(search_term)
+        query |= Q(pk__in=search.search(search_term))
+        return queryset.filter(query), False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs,
+        )
+        if db_field.name == 'group' and formfield is not None:
+            # Форма списка копируется для каждой строки, и выпадающий
+            # список групп иначе выбирался бы из базы для каждой из них.
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    """Комментарии: поиск по номеру публикации и имени автора."""
+
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    search_fields = ('post_id', 'author__username')
+    exact_search_fields = ('post_id', 'author__username')
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
+
+
+@admin.register(Like)
+class LikeAdmin(LargeTableAdmin):
+    """Лайки: поиск по номеру публикации и имени пользователя."""
+
+    list_display = ('pk', 'user', 'post')
+    list_select_related = ('user', 'post')
+    search_fields = ('post_id', 'user__username')
+    exact_search_fields = ('post_id', 'user__username')
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(Follow)
+class FollowAdmin(LargeTableAdmin):
+    """Подписки: поиск по имени подписчика или автора."""
+
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    exact_search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+
+
+@admin.register(ImageVariant)
+class ImageVariantAdmin(admin.ModelAdmin):
+    """Варианты картинок и экономия трафика по сравнению с оригиналами."""
+
+    list_display = (
+        'pk', 'post', 'format', 'width', 'height', 'size', 'source_size',
+        'saved_display',
+    )
+    list_filter = ('format', 'width')
+    list_select_related = ('post',)
+    raw_id_fields = ('post',)
+    readonly_fields = ('format', 'width', 'height', 'size', 'source_size')
+
+    def saved_display(self, obj):
+        return filesizeformat(obj.saved)
+
+    saved_display.short_description = 'Сэкономлено'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            totals = changelist.queryset.aggregate(
+                size=Sum('size'), saved=Sum(F('source_size') - F('size')),
+            )
+            response.context_data['title'] = (
+                f'Варианты картинок: {filesizeformat(totals["size"] or 0)}, '
+                f'сэкономлено {filesizeformat(totals["saved"] or 0)}'
+            )
+        return response
+
 
 admin.site.register(Group)
-admin.site.register(Follow)
-admin.site.register(Comment)
-admin.site.register(Like)
@@ -0,0 +1,214 @@
+"""JSON API лент и публикаций только для чтения.
+
+Ответы компактные: параметр fields выбирает поля, а страницы листаются
+курсором (параметры cursor и limit), как в HTML-лентах с
+CURSOR_PAGINATION.
+
+ETag и Last-Modified строятся из поколений и времени изменения
+областей ленты (posts.caching.validators), поэтому ответ 304 отдается
+без сериализации и без выборки публикаций. Любая запись, меняющая
+ленту, увеличивает поколение и меняет ETag.
+"""
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from core.queries import query_budget
+from posts import caching, likes
+from posts.models import Comment, Group, Post
+from posts.timeline import timeline_posts
+from posts.utils import CURSOR_PARAM, CursorPaginator
+
+API_PAGE_SIZE: int = 10
+API_MAX_PAGE_SIZE: int = 100
+FIELDS_PARAM: str = 'fields'
+LIMIT_PARAM: str = 'limit'
+
+User = get_user_model()
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+    'likes_count': lambda post: post.likes_count,
+    'is_liked_by_me': lambda post: post.is_liked_by_me,
+    'url': lambda post: reverse('posts:post_detail', args=(post.pk,)),
+}
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created,
+}
+
+
+class BadRequest(ValueError):
+    """Неверные параметры запроса: ответ 400 с описанием ошибок."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def api_response(data, status=200):
+    return JsonResponse(
+        data, status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def api_view(view):
+    """Только GET и HEAD; ошибки отдаются в JSON, а не страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return api_response({'errors': error.errors}, status=400)
+        except Http404:
+            return api_response(
+                {'errors': {'detail': ['Не найдено.']}}, status=404,
+            )
+    return wrapper
+
+
+def parse_fields(request, available):
+    """Поля из параметра fields; без него - все поля."""
+    value = request.GET.get(FIELDS_PARAM)
+    if not value:
+        return list(available)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise BadRequest({FIELDS_PARAM: [
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(available)}.'
+        ]})
+    return fields
+
+
+def parse_limit(request):
+    value = request.GET.get(LIMIT_PARAM)
+    if value is None:
+        return API_PAGE_SIZE
+    if not value.isdigit() or not 1 <= int(value) <= API_MAX_PAGE_SIZE:
+        raise BadRequest({LIMIT_PARAM: [
+            f'Ожидается целое число от 1 до {API_MAX_PAGE_SIZE}.'
+        ]})
+    return int(value)
+
+
+def serialize(obj, fields, available):
+    return {name: available[name](obj) for name in fields}
+
+
+def feed_response(request, queryset, key, scopes):
+    """Страница ленты публикаций в JSON с проверкой ETag."""
+    fields = parse_fields(request, POST_FIELDS)
+    limit = parse_limit(request)
+    etag, modified = caching.validators(request, f'api:{key}', scopes)
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    post_list = queryset.select_related(
+        'author', 'group',
+    ).with_engagement(request.user)
+    page = CursorPaginator(post_list, limit).get_page(
+        request.GET.get(CURSOR_PARAM),
+    )
+    likes.overlay(page, request.user)
+    response = api_response({
+        'results': [serialize(post, fields, POST_FIELDS) for post in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+    return caching.with_validators(request, response, etag, modified)
+
+
+@query_budget(4)
+@api_view
+def index(request):
+    """Лента всех публикаций."""
+    return feed_response(request, Post.objects.all(), 'index', [
+        caching.INDEX,
+    ])
+
+
+@query_budget(5)
+@api_view
+def group_posts(request, slug):
+    """Публикации группы."""
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed_response(request, group.posts.all(), f'group:{group.pk}', [
+        caching.group_scope(group.pk),
+    ])
+
+
+@query_budget(5)
+@api_view
+def profile_posts(request, username):
+    """Публикации автора."""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed_response(
+        request, author.posts.all(), f'author:{author.pk}',
+        [caching.author_scope(author.pk)],
+    )
+
+
+@query_budget(6)
+@api_view
+def follow_posts(request):
+    """Лента подписок текущего пользователя."""
+    if not request.user.is_authenticated:
+        return api_response(
+            {'errors': {'user': ['Требуется авторизация.']}}, status=401,
+        )
+    return feed_response(request, timeline_posts(request.user), 'follow', [
+        caching.INDEX,
+    ])
+
+
+@query_budget(6)
+@api_view
+def post_detail(request, post_id):
+    """Публикация со страницей комментариев."""
+    fields = parse_fields(request, POST_FIELDS)
+    limit = parse_limit(request)
+    etag, modified = caching.validators(
+        request, f'api:post:{post_id}', [caching.post_scope(post_id)],
+    )
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group').with_engagement(
+            request.user,
+        ),
+        pk=post_id,
+    )
+    comments = Comment.objects.filter(post_id=post_id)
+    likes.overlay([post], request.user)
+    page = CursorPaginator(comments.select_related('author'), limit).get_page(
+        request.GET.get(CURSOR_PARAM),
+    )
+    data = serialize(post, fields, POST_FIELDS)
+    data['comments'] = {
+        'results': [
+            serialize(comment, COMMENT_FIELDS, COMMENT_FIELDS)
+            for comment in page
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+    return caching.with_validators(
+        request, api_response(data), etag, modified,
+    )
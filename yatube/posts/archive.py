@@ -0,0 +1,169 @@
+"""Архив данных пользователя: публикации, комментарии, лайки и картинки.
+
+ZIP собирается потоком: публикации, комментарии и лайки читаются
+из базы через iterator() кусками по CHUNK_SIZE и пишутся строками
+JSON Lines, а картинки публикаций копируются из хранилища кусками
+без сжатия. Готовые байты отдаются сразу, поэтому память не зависит
+ни от числа публикаций, ни от размера картинок.
+
+archive_chunks() отдает архив в StreamingHttpResponse, а write_archive()
+в фоне пишет его файлом в MEDIA_ROOT/ARCHIVE_DIR.
+"""
+import json
+import os
+import secrets
+import time
+import zipfile
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from core import tasks
+from posts.models import Comment, Like, Post
+from posts.transfer import plain
+
+CHUNK_SIZE: int = 1000
+FILE_CHUNK_SIZE: int = 64 * 1024
+ARCHIVE_DIR: str = 'archives'
+ARCHIVE_INTERVAL: int = 600
+PART_SUFFIX: str = '.part'
+
+User = get_user_model()
+
+
+class StreamBuffer:
+    """Файл только для записи, из которого забираются записанные байты.
+
+    У него нет tell() и seek(), поэтому zipfile пишет архив
+    последовательно, с размерами записей после их данных.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def sections(user):
+    """Имена файлов JSON Lines и строки для них."""
+    posts = user.posts.order_by('pk').values(
+        'id', 'text', 'pub_date', 'group__slug', 'image',
+        'comments_count', 'likes_count',
+    )
+    comments = Comment.objects.filter(author=user).order_by('pk').values(
+        'id', 'post_id', 'text', 'created',
+    )
+    likes = Like.objects.filter(user=user).order_by('pk').values('post_id')
+    return (
+        ('posts.jsonl', posts),
+        ('comments.jsonl', comments),
+        ('likes.jsonl', likes),
+    )
+
+
+def archive_chunks(user):
+    """Байты ZIP-архива с данными пользователя по мере готовности."""
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, rows in sections(user):
+            with archive.open(name, 'w') as entry:
+                for row in rows.iterator(chunk_size=CHUNK_SIZE):
+                    entry.write(json.dumps(
+                        plain(row), ensure_ascii=False,
+                    ).encode() + b'\n')
+                    # Сжатые данные появляются блоками, а не на каждую
+                    # строку.
+                    if buffer.chunks:
+                        yield buffer.pop()
+            yield buffer.pop()
+        images = Post.objects.filter(author=user).exclude(
+            image='',
+        ).order_by('pk').values_list('image', flat=True)
+        for image in images.iterator(chunk_size=CHUNK_SIZE):
+            try:
+                source = default_storage.open(image)
+            except FileNotFoundError:
+                continue
+            # Картинки уже сжаты: сжимать их повторно - пустая работа.
+            info = zipfile.ZipInfo(f'media/{image}')
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, 'w') as entry:
+                for chunk in source.chunks(FILE_CHUNK_SIZE):
+                    entry.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def archive_directory(user_id):
+    return os.path.join(settings.MEDIA_ROOT, ARCHIVE_DIR, str(user_id))
+
+
+def write_archive(user_id):
+    """Пишет архив пользователя в MEDIA_ROOT и удаляет прежние архивы.
+
+    Имя файла случайное: MEDIA_ROOT раздается без проверки прав.
+    Пока архив пишется, у файла суффикс PART_SUFFIX.
+    """
+    user = User.objects.get(pk=user_id)
+    directory = archive_directory(user_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{secrets.token_urlsafe(16)}.zip')
+    with open(path + PART_SUFFIX, 'wb') as file:
+        for chunk in archive_chunks(user):
+            file.write(chunk)
+    os.replace(path + PART_SUFFIX, path)
+    for name in os.listdir(directory):
+        if name != os.path.basename(path) and not name.endswith(PART_SUFFIX):
+            os.remove(os.path.join(directory, name))
+    return path
+
+
+def scheduled_key(user_id):
+    return f'archive:scheduled:{user_id}'
+
+
+def schedule_archive(user_id):
+    """Ставит фоновую сборку архива не чаще раза в ARCHIVE_INTERVAL секунд.
+
+    Возвращает False, если архив уже недавно заказан.
+    """
+    if not cache.add(
+        scheduled_key(user_id), time.time() + ARCHIVE_INTERVAL,
+        ARCHIVE_INTERVAL,
+    ):
+        return False
+    tasks.submit(write_archive, user_id)
+    return True
+
+
+def next_request_time(user_id):
+    """Время, с которого архив можно заказать снова, или None."""
+    allowed = cache.get(scheduled_key(user_id))
+    if allowed is None:
+        return None
+    return datetime.fromtimestamp(allowed, timezone.utc)
+
+
+def ready_archive(user_id):
+    """URL готового архива пользователя или None."""
+    directory = archive_directory(user_id)
+    if not os.path.isdir(directory):
+        return None
+    for name in os.listdir(directory):
+        if not name.endswith(PART_SUFFIX):
+            return f'{settings.MEDIA_URL}{ARCHIVE_DIR}/{user_id}/{name}'
+    return None
@@ -0,0 +1,429 @@
+"""Нагрузочные замеры приложения posts.
+
+seed() наполняет базу синтетическими пользователями, группами,
+публикациями, лайками, подписками и комментариями. measure() прогоняет
+запросы к основным страницам через тестовый клиент и считает задержку
+p50/p99, число SQL-запросов на запрос и пропускную способность.
+compare() сравнивает результат с сохраненным базовым и возвращает
+список регрессий.
+
+Данные создаются пачками через bulk_create в обход сигналов, поэтому
+счетчики, статистика, ленты подписок и поисковый индекс
+пересчитываются после вставки.
+"""
+import contextlib
+import json
+import math
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from posts import search, stats, timeline
+from posts.management.commands.recount_counters import recount_counters
+from posts.models import Comment, Follow, Group, Like, Post, TimelineEntry
+
+SCALES = {
+    'tiny': {
+        'users': 50, 'groups': 3, 'posts': 300,
+        'likes': 1000, 'follows': 200, 'comments': 300,
+    },
+    'small': {
+        'users': 2000, 'groups': 20, 'posts': 20000,
+        'likes': 100000, 'follows': 20000, 'comments': 20000,
+    },
+    'full': {
+        'users': 100000, 'groups': 200, 'posts': 1000000,
+        'likes': 5000000, 'follows': 1000000, 'comments': 1000000,
+    },
+}
+SCENARIOS = (
+    'index', 'group_list', 'profile', 'post_detail', 'follow_index', 'like',
+    'search',
+)
+USERNAME_PREFIX = 'bench_'
+GROUP_PREFIX = 'bench-'
+BATCH_SIZE: int = 5000
+TEXT_POOL_SIZE: int = 1000
+DATE_SPREAD = timedelta(days=365)
+LOGGED_IN_CLIENTS: int = 20
+SEARCH_SAMPLE: int = 50
+# Хвост распределения на нескольких сотнях запросов шумный, поэтому
+# для p99 допуск в несколько раз шире, чем для медианы.
+P99_TOLERANCE_FACTOR: int = 3
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+User = get_user_model()
+
+
+@contextlib.contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать значения полей с auto_now_add при вставке."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def insert(model, objects, **kwargs):
+    """Вставляет объекты пачками, не держа их все в памяти."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch, **kwargs)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, **kwargs)
+
+
+def dataset():
+    """Объем синтетических данных, уже загруженных в базу."""
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    # Лайки не учитываются: их число меняет сценарий like.
+    return {
+        'users': users.count(),
+        'groups': Group.objects.filter(slug__startswith=GROUP_PREFIX).count(),
+        'posts': Post.objects.filter(author__in=users).count(),
+    }
+
+
+@transaction.atomic
+def seed(scale, seed=0):
+    """Создает синтетические данные заданного масштаба.
+
+    Все выполняется в одной транзакции: без нее каждая вставка
+    фиксировалась бы на диске отдельно.
+    """
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    texts = [fake.paragraph(nb_sentences=5) for _ in range(TEXT_POOL_SIZE)]
+    remarks = [fake.sentence() for _ in range(TEXT_POOL_SIZE)]
+    now = timezone.now()
+
+    def random_date():
+        return now - DATE_SPREAD * rng.random()
+
+    insert(User, (
+        User(
+            username=f'{USERNAME_PREFIX}{i}', password='!',
+            first_name=fake.first_name(), last_name=fake.last_name(),
+        )
+        for i in range(sizes['users'])
+    ))
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    user_ids = list(users.order_by('pk').values_list('pk', flat=True))
+    insert(Group, (
+        Group(
+            title=fake.catch_phrase()[:200], slug=f'{GROUP_PREFIX}{i}',
+            description=rng.choice(texts),
+        )
+        for i in range(sizes['groups'])
+    ))
+    group_ids = list(
+        Group.objects.filter(slug__startswith=GROUP_PREFIX)
+        .values_list('pk', flat=True)
+    )
+
+    # Распределение авторов неравномерное: у немногих авторов большая
+    # часть постов, как и в живой ленте.
+    with explicit_dates(Post._meta.get_field('pub_date')):
+        insert(Post, (
+            Post(
+                author_id=user_ids[int(len(user_ids) * rng.random() ** 3)],
+                group_id=rng.choice(group_ids) if rng.random() < 0.7 else None,
+                text=rng.choice(texts), pub_date=random_date(),
+            )
+            for _ in range(sizes['posts'])
+        ))
+    posts = Post.objects.filter(author__in=users)
+    post_ids = list(posts.order_by('pk').values_list('pk', flat=True))
+
+    likes_per_user = min(sizes['likes'] // len(user_ids), len(post_ids))
+    insert(Like, (
+        Like(user_id=user_id, post_id=post_id)
+        for user_id in user_ids
+        for post_id in rng.sample(post_ids, likes_per_user)
+    ), ignore_conflicts=True)
+
+    follows_per_user = min(sizes['follows'] // len(user_ids), len(user_ids))
+    insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(user_ids, follows_per_user)
+        if author_id != user_id
+    ), ignore_conflicts=True)
+
+    with explicit_dates(Comment._meta.get_field('created')):
+        insert(Comment, (
+            Comment(
+                post_id=rng.choice(post_ids), author_id=rng.choice(user_ids),
+                text=rng.choice(remarks), created=random_date(),
+            )
+            for _ in range(sizes['comments'])
+        ))
+
+    recount_counters(posts)
+    stats.recount(users)
+    fill_timelines(posts, Follow.objects.filter(user__in=users))
+    search.rebuild(posts)
+    return dataset()
+
+
+def fill_timelines(posts, follows):
+    """Заполняет ленты подписок так же, как timeline.backfill.
+
+    Посты авторов собираются в памяти один раз, а не запрашиваются
+    заново для каждой подписки.
+    """
+    recent = {}
+    rows = posts.order_by('-pub_date', '-pk').values_list(
+        'pk', 'author_id', 'pub_date',
+    )
+    for post_id, author_id, pub_date in rows.iterator():
+        author_posts = recent.setdefault(author_id, [])
+        if len(author_posts) < settings.TIMELINE_BACKFILL:
+            author_posts.append((post_id, pub_date))
+    heavy_ids = timeline.heavy_author_ids()
+    insert(TimelineEntry, (
+        TimelineEntry(
+            user_id=user_id, post_id=post_id,
+            author_id=author_id, pub_date=pub_date,
+        )
+        for user_id, author_id in follows.values_list('user', 'author')
+        if author_id not in heavy_ids
+        for post_id, pub_date in recent.get(author_id, ())
+    ), ignore_conflicts=True)
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+class Workload:
+    """Случайные запросы к страницам по синтетическим данным."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        self.post_ids = list(
+            Post.objects.filter(author__in=users).values_list('pk', flat=True)
+        )
+        self.authors = list(
+            users.filter(stats__posts_count__gt=0)
+            .values_list('username', flat=True)
+        )
+        self.slugs = list(
+            Group.objects.filter(slug__startswith=GROUP_PREFIX)
+            .values_list('slug', flat=True)
+        )
+        followers = list(
+            users.filter(stats__following_count__gt=0)
+            .order_by('pk')[:LOGGED_IN_CLIENTS]
+        )
+        # Слова для поиска берутся из текстов публикаций, чтобы запросы
+        # из двух слов тоже что-то находили.
+        self.phrases = [
+            search.WORD.findall(text)
+            for text in Post.objects.filter(
+                pk__in=self.post_ids[:SEARCH_SAMPLE],
+            ).order_by('pk').values_list('text', flat=True)
+        ]
+        if not self.post_ids or not self.authors or not followers:
+            raise ValueError(
+                'В базе нет синтетических данных, '
+                'сначала выполните bench_seed.'
+            )
+        self.anonymous = Client()
+        self.clients = []
+        for user in followers:
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+
+    def request(self, scenario):
+        """Возвращает клиента, метод и адрес очередного запроса."""
+        rng = self.rng
+        page = f'?page={rng.randint(1, 5)}'
+        if scenario == 'index':
+            return self.anonymous, 'get', reverse('posts:index') + page
+        if scenario == 'group_list':
+            slug = rng.choice(self.slugs)
+            return (
+                self.anonymous, 'get',
+                reverse('posts:group_list', args=(slug,)) + page,
+            )
+        if scenario == 'profile':
+            username = rng.choice(self.authors)
+            return (
+                self.anonymous, 'get',
+                reverse('posts:profile', args=(username,)),
+            )
+        if scenario == 'post_detail':
+            post_id = rng.choice(self.post_ids)
+            return (
+                self.anonymous, 'get',
+                reverse('posts:post_detail', args=(post_id,)),
+            )
+        if scenario == 'follow_index':
+            return (
+                rng.choice(self.clients), 'get',
+                reverse('posts:follow_index') + page,
+            )
+        if scenario == 'like':
+            post_id = rng.choice(self.post_ids)
+            return (
+                rng.choice(self.clients), 'post',
+                reverse('posts:like_post', args=(post_id,)),
+            )
+        if scenario == 'search':
+            words = rng.choice(self.phrases)
+            query = ' '.join(rng.sample(words, min(len(words), 2)))
+            return (
+                self.anonymous, 'get',
+                f'{reverse("posts:search")}?{urlencode({"q": query})}',
+            )
+        raise ValueError(f'Неизвестный сценарий: {scenario}')
+
+
+def run_round(workload, scenario, requests, warmup):
+    """Один проход сценария: прогрев и замер requests запросов."""
+    cache.clear()
+    for _ in range(warmup):
+        client, method, url = workload.request(scenario)
+        getattr(client, method)(url)
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        client, method, url = workload.request(scenario)
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = getattr(client, method)(url)
+            latencies.append(time.perf_counter() - request_started)
+        queries.append(len(captured))
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mean_queries': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+        'throughput_rps': round(requests / elapsed, 1),
+    }
+
+
+def check_cache():
+    """Не дает замерам очищать общий кэш работающего сервера."""
+    location = settings.CACHES['default'].get('LOCATION')
+    if location == os.path.join(settings.BASE_DIR, 'cache.sqlite3'):
+        raise ValueError(
+            'Замеры очищают кэш: задайте отдельный CACHE_LOCATION, '
+            'например CACHE_LOCATION=bench_cache.sqlite3.'
+        )
+
+
+def measure(scenarios=SCENARIOS, requests=200, warmup=10, rounds=3, seed=0):
+    """Замеряет задержку, число запросов к базе и пропускную способность.
+
+    Каждый сценарий прогоняется rounds раз, и для задержки
+    и пропускной способности берется лучший проход, как в timeit:
+    худшие проходы отражают помехи от других процессов, а не код.
+    """
+    check_cache()
+    workload = Workload(random.Random(seed))
+    results = {}
+    for scenario in scenarios:
+        passes = [
+            run_round(workload, scenario, requests, warmup)
+            for _ in range(rounds)
+        ]
+        results[scenario] = {
+            'requests': requests * rounds,
+            'errors': sum(result['errors'] for result in passes),
+            'p50_ms': min(result['p50_ms'] for result in passes),
+            'p99_ms': min(result['p99_ms'] for result in passes),
+            'mean_queries': max(result['mean_queries'] for result in passes),
+            'max_queries': max(result['max_queries'] for result in passes),
+            'throughput_rps': max(
+                result['throughput_rps'] for result in passes
+            ),
+        }
+    return {'dataset': dataset(), 'scenarios': results}
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Список регрессий результата относительно базового замера.
+
+    Задержка и пропускная способность сравниваются с допуском
+    tolerance, число запросов к базе - точно.
+    """
+    allowed = {
+        'p50_ms': 1 + tolerance,
+        'p99_ms': 1 + tolerance * P99_TOLERANCE_FACTOR,
+    }
+    min_throughput = 1 / (1 + tolerance)
+    if results['dataset'] != baseline['dataset']:
+        raise ValueError(
+            'Базовый замер снят на другом объеме данных: '
+            f'{baseline["dataset"]} вместо {results["dataset"]}.'
+        )
+    regressions = []
+    for scenario, current in results['scenarios'].items():
+        base = baseline['scenarios'].get(scenario)
+        if base is None:
+            continue
+        if current['errors']:
+            regressions.append(
+                f'{scenario}: ошибок {current["errors"]}',
+            )
+        for metric, factor in allowed.items():
+            if current[metric] > base[metric] * factor:
+                regressions.append(
+                    f'{scenario}: {metric} {current[metric]} '
+                    f'вместо {base[metric]}',
+                )
+        if current['max_queries'] > base['max_queries']:
+            regressions.append(
+                f'{scenario}: запросов к базе {current["max_queries"]} '
+                f'вместо {base["max_queries"]}',
+            )
+        if current['throughput_rps'] < base['throughput_rps'] * min_throughput:
+            regressions.append(
+                f'{scenario}: пропускная способность '
+                f'{current["throughput_rps"]} вместо {base["throughput_rps"]}',
+            )
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(results, baseline_file, ensure_ascii=False, indent=2)
+        baseline_file.write('\n')
@@ -0,0 +1,171 @@
+"""Версионированные ключи кэша фрагментов лент и условные ответы.
+
+Каждая область (вся лента, группа, автор, публикация, статистика
+и подписки пользователя) имеет счетчик поколений. Он входит в ключ
+кэшированного фрагмента, а любая запись, меняющая содержимое области,
+увеличивает счетчик. Поэтому фрагменты могут жить часами и не отдают
+устаревших данных.
+
+Вместе с поколением запоминается время последнего изменения области.
+Из них строятся ETag и Last-Modified страниц, и запрос с актуальными
+If-None-Match или If-Modified-Since получает 304 без отрисовки.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+INDEX: str = 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def stats_scope(user_id):
+    return f'stats:{user_id}'
+
+
+def syndication_scope(scope):
+    """Область ленты Atom, RSS и JSON Feed: меняется только вместе
+    с публикациями, а не с комментариями и лайками."""
+    return f'syndication:{scope}'
+
+
+def viewer_scopes(user):
+    """Области, зависящие от читателя: подписки и отложенные лайки."""
+    if not user.is_authenticated:
+        return []
+    return [user_scope(user.pk)]
+
+
+def post_scopes(author_id, group_id, post_id=None):
+    """Области, в которых показывается публикация."""
+    scopes = [INDEX, author_scope(author_id)]
+    if group_id is not None:
+        scopes.append(group_scope(group_id))
+    if post_id is not None:
+        scopes.append(post_scope(post_id))
+    return scopes
+
+
+def generation_key(scope):
+    return f'generation:{scope}'
+
+
+def modified_key(scope):
+    return f'modified:{scope}'
+
+
+def initial_generation():
+    """Начальное поколение берется из времени, чтобы после вытеснения
+    счетчика из кэша не совпасть с ключами старых фрагментов."""
+    return int(time.time() * 1000)
+
+
+def feed_version(*scopes):
+    """Строка из текущих поколений областей для ключа фрагмента."""
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, initial_generation(), None)
+            generations[key] = cache.get(key)
+    return '.'.join(str(generations[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Инвалидирует фрагменты областей, увеличивая их поколения,
+    и запоминает время изменения."""
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_generation(), None)
+    if scopes:
+        now = int(time.time())
+        cache.set_many({modified_key(scope): now for scope in scopes}, None)
+
+
+def last_modified(*scopes):
+    """Время последнего изменения областей в секундах.
+
+    Для области без записи (новой или вытесненной из кэша) временем
+    изменения считается прошлая секунда: запись после этого получит
+    более позднее время.
+    """
+    keys = [modified_key(scope) for scope in scopes]
+    modified = cache.get_many(keys)
+    for key in keys:
+        if key not in modified:
+            cache.add(key, int(time.time()) - 1, None)
+            modified[key] = cache.get(key)
+    return max(modified.values())
+
+
+def validators(request, key, scopes):
+    """ETag и Last-Modified ответа по областям, читателю и параметрам.
+
+    Области читателя добавляются сами: от них зависят его подписки
+    и еще не записанные лайки.
+    """
+    scopes = [*scopes, *viewer_scopes(request.user)]
+    source = (
+        f'{key}:{feed_version(*scopes)}:'
+        f'{request.user.pk}:{sorted(request.GET.lists())}'
+    )
+    etag = quote_etag(hashlib.sha1(source.encode()).hexdigest())
+    return etag, last_modified(*scopes)
+
+
+def not_modified(request, etag, modified):
+    """Ответ 304, если у клиента актуальная версия, иначе None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=modified,
+    )
+
+
+def http_last_modified(modified):
+    """Значение Last-Modified для времени изменения областей.
+
+    Время хранится с точностью до секунды, и две записи в одной
+    секунде дают одно время при разных поколениях. Пока секунда
+    изменения не прошла, ответ получает на секунду более раннее время:
+    клиент с одним If-Modified-Since получит страницу заново, а 304
+    ему отдаст только совпавший ETag, построенный из поколений.
+    """
+    return http_date(min(modified, int(time.time()) - 1))
+
+
+def with_validators(request, response, etag, modified):
+    """Добавляет к ответу ETag, Last-Modified и Cache-Control.
+
+    Гостевые страницы одинаковы для всех гостей, и их короткое время
+    кэширует обратный прокси. Страницы пользователя кэширует только
+    браузер, каждый раз сверяясь с сервером.
+    """
+    response['ETag'] = etag
+    response['Last-Modified'] = http_last_modified(modified)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.ANONYMOUS_MAX_AGE,
+        )
+    return response
@@ -0,0 +1,251 @@
+"""Ленты Atom, RSS и JSON Feed всего сайта, групп и авторов.
+
+Документ ленты собирается один раз после записи: сигналы публикаций
+увеличивают поколение области syndication_scope и ставят фоновую
+пересборку rebuild(). Готовые байты лежат в кэше вместе с поколением,
+из которого они собраны, и запрос отдает их как есть. Если снимок
+устарел или вытеснен, его собирает первый запрос.
+
+ETag и Last-Modified строятся из поколения и времени изменения
+области, поэтому ответ 304 обходится без чтения снимка.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import quote_etag
+from django.utils.text import Truncator
+from django.views.decorators.http import require_safe
+
+from core import tasks
+from core.queries import query_budget
+from posts import caching
+from posts.models import Group, Post
+
+FEED_SIZE: int = 20
+TITLE_WORDS: int = 8
+JSON_FEED_VERSION: str = 'https://jsonfeed.org/version/1.1'
+CONTENT_TYPES = {
+    'atom': 'application/atom+xml; charset=utf-8',
+    'rss': 'application/rss+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+GENERATORS = {'atom': Atom1Feed, 'rss': Rss201rev2Feed}
+
+User = get_user_model()
+
+
+class FeedSource:
+    """Что попадает в ленту и как она называется."""
+
+    def __init__(self, scope, title, link, posts, url_name, url_args=()):
+        self.scope = scope
+        self.title = title
+        self.link = link
+        self.posts = posts
+        self.url_name = url_name
+        self.url_args = url_args
+
+    def feed_url(self, fmt):
+        return absolute(reverse(self.url_name, args=(*self.url_args, fmt)))
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def site_source():
+    return FeedSource(
+        caching.INDEX, 'Последние цитаты', reverse('posts:index'),
+        Post.objects.all(), 'posts:feed',
+    )
+
+
+def group_source(group):
+    return FeedSource(
+        caching.group_scope(group.pk), group.title,
+        reverse('posts:group_list', args=(group.slug,)),
+        Post.objects.filter(group_id=group.pk), 'posts:group_feed',
+        (group.slug,),
+    )
+
+
+def author_source(author):
+    return FeedSource(
+        caching.author_scope(author.pk),
+        f'Цитаты {author.get_full_name() or author.username}',
+        reverse('posts:profile', args=(author.username,)),
+        Post.objects.filter(author_id=author.pk), 'posts:profile_feed',
+        (author.username,),
+    )
+
+
+def load_source(scope):
+    """Источник ленты области или None, если группы или автора нет."""
+    if scope == caching.INDEX:
+        return site_source()
+    kind, _, pk = scope.partition(':')
+    if kind == 'group':
+        group = Group.objects.filter(pk=pk).first()
+        return group and group_source(group)
+    author = User.objects.filter(pk=pk).first()
+    return author and author_source(author)
+
+
+def latest_posts(source):
+    return list(
+        source.posts.select_related('author', 'group')[:FEED_SIZE]
+    )
+
+
+def post_title(post):
+    return Truncator(post.text).words(TITLE_WORDS)
+
+
+def author_name(post):
+    return post.author.get_full_name() or post.author.username
+
+
+def build(source, fmt, posts):
+    """Документ ленты в байтах."""
+    if fmt == 'json':
+        items = []
+        for post in posts:
+            url = absolute(reverse('posts:post_detail', args=(post.pk,)))
+            item = {
+                'id': url,
+                'url': url,
+                'title': post_title(post),
+                'content_text': post.text,
+                'date_published': post.pub_date.isoformat(),
+                'authors': [{'name': author_name(post)}],
+            }
+            if post.group_id:
+                item['tags'] = [post.group.title]
+            items.append(item)
+        return json.dumps({
+            'version': JSON_FEED_VERSION,
+            'title': source.title,
+            'home_page_url': absolute(source.link),
+            'feed_url': source.feed_url(fmt),
+            'language': 'ru',
+            'items': items,
+        }, ensure_ascii=False).encode()
+    feed = GENERATORS[fmt](
+        title=source.title, link=absolute(source.link),
+        description=source.title, language='ru',
+        feed_url=source.feed_url(fmt),
+    )
+    for post in posts:
+        url = absolute(reverse('posts:post_detail', args=(post.pk,)))
+        feed.add_item(
+            title=post_title(post), link=url, unique_id=url,
+            description=post.text, pubdate=post.pub_date,
+            author_name=author_name(post),
+            categories=[post.group.title] if post.group_id else None,
+        )
+    return feed.writeString('utf-8').encode()
+
+
+def snapshot_key(scope, fmt):
+    return f'syndication:{scope}:{fmt}'
+
+
+def store(source, version, posts, fmt):
+    data = build(source, fmt, posts)
+    cache.set(snapshot_key(source.scope, fmt), (version, data), None)
+    return data
+
+
+def rebuild(*scopes):
+    """Пересобирает снимки всех форматов лент областей."""
+    for scope in scopes:
+        version = caching.feed_version(caching.syndication_scope(scope))
+        source = load_source(scope)
+        if source is None:
+            cache.delete_many([
+                snapshot_key(scope, fmt) for fmt in CONTENT_TYPES
+            ])
+            continue
+        posts = latest_posts(source)
+        for fmt in CONTENT_TYPES:
+            store(source, version, posts, fmt)
+
+
+def changed(*scopes):
+    """Отмечает, что публикации областей изменились, и ставит пересборку.
+
+    Снимки, собранные до фиксации транзакции, могли прочитать старые
+    данные с новым поколением, поэтому пересборка после фиксации
+    перезаписывает их без проверки поколения.
+    """
+    caching.bump(*[caching.syndication_scope(scope) for scope in scopes])
+    tasks.submit(rebuild, *scopes)
+
+
+def serve(request, fmt, scope, get_source):
+    """Снимок ленты с проверкой ETag; get_source() - при сборке."""
+    if fmt not in CONTENT_TYPES:
+        raise Http404('Неизвестный формат ленты.')
+    syndication = caching.syndication_scope(scope)
+    version = caching.feed_version(syndication)
+    source = f'syndication:{scope}:{fmt}:{version}'
+    etag = quote_etag(hashlib.sha1(source.encode()).hexdigest())
+    modified = caching.last_modified(syndication)
+    response = caching.not_modified(request, etag, modified)
+    if response is None:
+        cached = cache.get(snapshot_key(scope, fmt))
+        if cached is not None and cached[0] == version:
+            data = cached[1]
+        else:
+            feed_source = get_source()
+            data = store(feed_source, version, latest_posts(feed_source), fmt)
+        response = HttpResponse(data, content_type=CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    response['Last-Modified'] = caching.http_last_modified(modified)
+    # Лента одинакова для всех читателей.
+    patch_cache_control(
+        response, public=True, max_age=settings.ANONYMOUS_MAX_AGE,
+    )
+    return response
+
+
+@query_budget(1)
+@require_safe
+def index_feed(request, fmt):
+    """Лента всех публикаций."""
+    return serve(request, fmt, caching.INDEX, site_source)
+
+
+@query_budget(2)
+@require_safe
+def group_feed(request, slug, fmt):
+    """Лента публикаций группы."""
+    group = get_object_or_404(
+        Group.objects.only('pk', 'slug', 'title'), slug=slug,
+    )
+    return serve(
+        request, fmt, caching.group_scope(group.pk),
+        lambda: group_source(group),
+    )
+
+
+@query_budget(2)
+@require_safe
+def author_feed(request, username, fmt):
+    """Лента публикаций автора."""
+    author = get_object_or_404(
+        User.objects.only('pk', 'username', 'first_name', 'last_name'),
+        username=username,
+    )
+    return serve(
+        request, fmt, caching.author_scope(author.pk),
+        lambda: author_source(author),
+    )
@@ -1,6 +1,6 @@
 from django import forms
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
 
 
 class PostForm(forms.ModelForm):
@@ -23,3 +23,14 @@ class CommentForm(forms.ModelForm):
         widgets = {
             'text': forms.Textarea(attrs={'style': 'height: 100px'})
         }
+
+
+class SearchForm(forms.Form):
+    """Форма поиска публикаций с фильтрами по группе и автору."""
+
+    q = forms.CharField(label='Найти', max_length=200)
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.order_by('title'), to_field_name='slug',
+        required=False, label='Группа', empty_label='Все группы',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
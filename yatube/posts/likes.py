@@ -0,0 +1,320 @@
+"""Отложенная запись лайков (write-behind).
+
+При LIKE_WRITE_BEHIND переключение лайка не пишет в базу: новое
+состояние и порядковый номер попадают в журнал в общем кэше,
+а flush() раз в LIKE_FLUSH_INTERVAL секунд переносит в базу чистый
+итог пачками: повторные клики одного пользователя по одной публикации
+сокращаются, лайки добавляются одним bulk_create, снимаются одним
+DELETE на публикацию, а счетчик публикации меняется один раз.
+
+До переноса чтение накладывает журнал на данные базы (overlay()):
+пользователь сразу видит свой лайк, а все - число лайков с учетом
+еще не записанных.
+"""
+import contextlib
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from core import tasks
+from posts import caching
+from posts.models import Like, Post
+
+SEQUENCE_KEY: str = 'likes:sequence'
+FLUSHED_KEY: str = 'likes:flushed'
+GAP_KEY: str = 'likes:gap'
+FLUSH_LOCK_KEY: str = 'likes:flush-lock'
+FLUSH_SCHEDULED_KEY: str = 'likes:flush-scheduled'
+FLUSH_LOCK_TIMEOUT: int = 60
+TOGGLE_LOCK_TIMEOUT: int = 5
+TOGGLE_LOCK_ATTEMPTS: int = 50
+TOGGLE_LOCK_WAIT: float = 0.01
+FLUSH_BATCH: int = 1000
+
+
+def enabled():
+    return settings.LIKE_WRITE_BEHIND
+
+
+def journal_key(number):
+    return f'likes:journal:{number}'
+
+
+def state_key(user_id, post_id):
+    return f'likes:state:{user_id}:{post_id}'
+
+
+def toggle_lock_key(user_id, post_id):
+    return f'likes:toggle-lock:{user_id}:{post_id}'
+
+
+def delta_key(post_id):
+    return f'likes:delta:{post_id}'
+
+
+def incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key, delta)
+
+
+def schedule_flush():
+    """Ставит перенос на конец интервала LIKE_FLUSH_INTERVAL.
+
+    Пока перенос ждет своего срока, новые клики его не ставят:
+    их записи журнала уже есть, и он их заберет.
+    """
+    if cache.add(
+        FLUSH_SCHEDULED_KEY, True,
+        settings.LIKE_FLUSH_INTERVAL + FLUSH_LOCK_TIMEOUT,
+    ):
+        tasks.submit_later(settings.LIKE_FLUSH_INTERVAL, scheduled_flush)
+
+
+def scheduled_flush():
+    """Перенос по расписанию; повторяется, пока журнал не перенесен.
+
+    Отметка снимается до чтения журнала: клик, записанный после нее,
+    ставит следующий перенос сам.
+    """
+    cache.delete(FLUSH_SCHEDULED_KEY)
+    flush()
+    if cache.get(SEQUENCE_KEY, 0) > cache.get(FLUSHED_KEY, 0):
+        schedule_flush()
+
+
+@contextlib.contextmanager
+def toggle_lock(user_id, post_id):
+    """Очередь кликов одного пользователя по одной публикации.
+
+    Без нее два одновременных клика прочитали бы одно состояние
+    и оба изменили бы число лайков в одну сторону. Если блокировку
+    не удалось взять за TOGGLE_LOCK_ATTEMPTS попыток, клик проходит
+    без нее: число лайков поправит перенос.
+    """
+    key = toggle_lock_key(user_id, post_id)
+    for _ in range(TOGGLE_LOCK_ATTEMPTS):
+        locked = cache.add(key, True, TOGGLE_LOCK_TIMEOUT)
+        if locked:
+            break
+        time.sleep(TOGGLE_LOCK_WAIT)
+    try:
+        yield
+    finally:
+        if locked:
+            cache.delete(key)
+
+
+def toggle(user, post):
+    """Переключает лайк в журнале. Возвращает состояние и число лайков.
+
+    Состояние пользователя хранится до переноса его последнего клика.
+    Перенос ставится после записи в журнал, чтобы он ее увидел.
+    """
+    key = state_key(user.pk, post.pk)
+    with toggle_lock(user.pk, post.pk):
+        pending = cache.get(key)
+        if pending is None:
+            liked = Like.objects.filter(user=user, post=post).exists()
+        else:
+            liked = pending[0]
+        liked = not liked
+        number = incr(SEQUENCE_KEY)
+        # Число лайков меняется до записи журнала: перенос, который
+        # увидит запись, увидит и ее вклад в delta_key.
+        delta = incr(delta_key(post.pk), 1 if liked else -1)
+        cache.set(journal_key(number), (user.pk, post.pk, liked), None)
+        cache.set(key, (liked, number), None)
+    caching.bump(caching.user_scope(user.pk))
+    schedule_flush()
+    return liked, max(post.likes_count + delta, 0)
+
+
+def overlay(posts, user):
+    """Накладывает журнал на likes_count и is_liked_by_me публикаций."""
+    if not enabled():
+        return
+    posts = list(posts)
+    keys = [delta_key(post.pk) for post in posts]
+    if user.is_authenticated:
+        keys += [state_key(user.pk, post.pk) for post in posts]
+    pending = cache.get_many(keys)
+    if not pending:
+        return
+    for post in posts:
+        delta = pending.get(delta_key(post.pk), 0)
+        post.likes_count = max(post.likes_count + delta, 0)
+        if user.is_authenticated:
+            state = pending.get(state_key(user.pk, post.pk))
+            if state is not None:
+                post.is_liked_by_me = state[0]
+
+
+def read_journal(flushed, last):
+    """Записи журнала после flushed по порядку, не больше FLUSH_BATCH.
+
+    Номер выдается до записи самой строки журнала, поэтому пропуск
+    может оказаться кликом, который еще записывается. На пропуске
+    чтение останавливается; пропуск, оставшийся с прошлого переноса,
+    считается потерянным и пропускается.
+    """
+    numbers = range(flushed + 1, min(last, flushed + FLUSH_BATCH) + 1)
+    found = cache.get_many([journal_key(number) for number in numbers])
+    entries = []
+    for number in numbers:
+        entry = found.get(journal_key(number))
+        if entry is None:
+            if cache.get(GAP_KEY) != number:
+                cache.set(GAP_KEY, number, None)
+                break
+            continue
+        entries.append(entry)
+        flushed = number
+    else:
+        flushed = numbers[-1]
+    return entries, flushed
+
+
+def net_changes(entries):
+    """Итог записей журнала: {(user_id, post_id): лайк}.
+
+    Берется последнее состояние пары, а не разница с базой на момент
+    первого клика: та могла измениться переносом, идущим во время
+    клика. apply() сам сверяет состояние с базой.
+    """
+    return {
+        (user_id, post_id): liked for user_id, post_id, liked in entries
+    }
+
+
+def apply(changes):
+    """Записывает изменения в базу. Возвращает изменения счетчиков."""
+    added = defaultdict(set)
+    removed = defaultdict(set)
+    for (user_id, post_id), liked in changes.items():
+        (added if liked else removed)[post_id].add(user_id)
+    counters = defaultdict(int)
+    db = router.db_for_write(Like)
+    existing = Like.objects.using(db).filter(
+        post_id__in=added,
+    ).values_list('post_id', 'user_id')
+    for post_id, user_id in existing:
+        if user_id in added[post_id]:
+            added[post_id].discard(user_id)
+    # Публикации, удаленные до переноса, пропускаются.
+    alive = set(Post.objects.using(db).filter(
+        pk__in=[*added, *removed],
+    ).values_list('pk', flat=True))
+    Like.objects.using(db).bulk_create(
+        [
+            Like(user_id=user_id, post_id=post_id)
+            for post_id, users in added.items() if post_id in alive
+            for user_id in users
+        ],
+        ignore_conflicts=True,
+    )
+    for post_id, users in added.items():
+        if post_id in alive:
+            counters[post_id] += len(users)
+    # DELETE напрямую, а не QuerySet.delete(): тот отправил бы
+    # post_delete и пересчитал счетчик для каждого лайка отдельно.
+    table = connections[db].ops.quote_name(Like._meta.db_table)
+    with connections[db].cursor() as cursor:
+        for post_id, users in removed.items():
+            placeholders = ', '.join(['%s'] * len(users))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE post_id = %s '
+                f'AND user_id IN ({placeholders})',
+                [post_id, *users],
+            )
+            counters[post_id] -= cursor.rowcount
+    for post_id, delta in counters.items():
+        if not delta:
+            continue
+        posts = Post.objects.using(db).filter(pk=post_id)
+        if delta < 0:
+            posts = posts.filter(likes_count__gte=-delta)
+        posts.update(likes_count=F('likes_count') + delta)
+    return counters
+
+
+def flush():
+    """Переносит журнал лайков в базу. Возвращает число записей журнала."""
+    if not cache.add(FLUSH_LOCK_KEY, True, FLUSH_LOCK_TIMEOUT):
+        return 0
+    total = 0
+    posts = set()
+    try:
+        while True:
+            flushed = cache.get(FLUSHED_KEY, 0)
+            last = cache.get(SEQUENCE_KEY, 0)
+            if last <= flushed:
+                break
+            entries, processed = read_journal(flushed, last)
+            if processed == flushed:
+                break
+            total += len(entries)
+            flush_entries(entries, processed)
+            posts.update(post_id for _, post_id, _ in entries)
+            cache.delete_many([
+                journal_key(number)
+                for number in range(flushed + 1, processed + 1)
+            ])
+            cache.set(FLUSHED_KEY, processed, None)
+            # Пропуск считается потерянным только при следующем
+            # переносе: за это время недописанная запись появится.
+            if processed < min(last, flushed + FLUSH_BATCH):
+                break
+        reconcile(posts)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+    return total
+
+
+def flush_entries(entries, processed):
+    with transaction.atomic(using=router.db_for_write(Like)):
+        counters = apply(net_changes(entries))
+    pairs = {(user_id, post_id) for user_id, post_id, _ in entries}
+    keys = [state_key(*pair) for pair in pairs]
+    states = cache.get_many(keys)
+    cache.delete_many([
+        key for key, (_, number) in states.items() if number <= processed
+    ])
+    scopes = set()
+    for fields in Post.objects.filter(
+        pk__in=[post_id for post_id, delta in counters.items() if delta],
+    ).values('author_id', 'group_id', 'pk'):
+        scopes.update(caching.post_scopes(
+            fields['author_id'], fields['group_id'], fields['pk'],
+        ))
+    caching.bump(*scopes)
+
+
+def reconcile(posts):
+    """Приводит delta_key публикаций к записям, еще оставшимся в журнале.
+
+    После переноса в likes_count уже есть все, что записал apply(),
+    а к нему добавляется только еще не перенесенное. Поэтому delta_key
+    не уменьшается на перенесенные записи, а пересчитывается заново:
+    вклад потерянной записи журнала, пропущенной read_journal(),
+    так не остается в числе лайков навсегда.
+    """
+    if not posts:
+        return
+    flushed = cache.get(FLUSHED_KEY, 0)
+    last = min(cache.get(SEQUENCE_KEY, 0), flushed + FLUSH_BATCH)
+    deltas = dict.fromkeys(posts, 0)
+    for _, post_id, liked in cache.get_many([
+        journal_key(number) for number in range(flushed + 1, last + 1)
+    ]).values():
+        if post_id in deltas:
+            deltas[post_id] += 1 if liked else -1
+    cache.set_many({
+        delta_key(post_id): delta for post_id, delta in deltas.items()
+    }, None)
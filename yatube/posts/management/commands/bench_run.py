@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку p50/p99, число запросов к базе и пропускную '
+        'способность страниц и завершается с ошибкой при регрессии '
+        'относительно базового замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmarks.SCENARIOS,
+            help='Сценарий замера; можно повторять (по умолчанию все).',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--rounds', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--baseline', default=benchmarks.BASELINE_PATH,
+            help='Файл базового замера.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимое ухудшение медианы задержки и пропускной '
+                 'способности; для p99 допуск втрое шире.',
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Сохранить результат как новый базовый замер.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmarks.measure(
+                options['scenario'] or benchmarks.SCENARIOS,
+                requests=options['requests'],
+                warmup=options['warmup'],
+                rounds=options['rounds'],
+                seed=options['seed'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+
+        if options['save_baseline']:
+            benchmarks.save_baseline(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS('Базовый замер сохранен.'))
+            return
+        try:
+            baseline = benchmarks.load_baseline(options['baseline'])
+            regressions = benchmarks.compare(
+                results, baseline, options['tolerance'],
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими данными для нагрузочных замеров. '
+        'Запускайте на отдельной базе, например DB_NAME=bench.sqlite3.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=benchmarks.SCALES, default='small',
+            help='Объем данных (по умолчанию small).',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел.',
+        )
+
+    def handle(self, *args, **options):
+        prefix = benchmarks.USERNAME_PREFIX
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                'Синтетические данные уже загружены, используйте чистую базу.'
+            )
+        loaded = benchmarks.seed(options['scale'], options['seed'])
+        self.stdout.write(self.style.SUCCESS(f'Загружено: {loaded}.'))
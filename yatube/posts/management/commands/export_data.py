@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, публикации или комментарии в файл CSV или '
+        'JSON Lines, читая таблицу кусками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для записи.')
+        parser.add_argument(
+            '--model', choices=transfer.TRANSFERS, required=True,
+            help='Что выгружать.',
+        )
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS,
+            help='Формат файла (по умолчанию по расширению).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+            help='Строк, читаемых из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            exported, seconds = transfer.export_records(
+                options['model'], options['path'], options['format'],
+                batch_size=options['batch_size'],
+            )
+        except (OSError, transfer.TransferError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено записей: {exported} за {seconds:.1f} с '
+            f'({exported / seconds:.0f} в секунду).'
+        ))
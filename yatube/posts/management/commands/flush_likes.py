@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import likes
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит в базу лайки, накопленные в журнале при '
+        'LIKE_WRITE_BEHIND; с --every работает как периодический воркер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float, default=0,
+            help='Повторять перенос каждые N секунд.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = likes.flush()
+            if flushed or not options['every']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Перенесено записей журнала: {flushed}.'
+                ))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит недостающие миниатюры картинок публикаций, например '
+        'для картинок, загруженных до появления фоновой очереди; '
+        'с --force перестраивает миниатюры всех картинок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить и уже построенные миниатюры.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['force']:
+            posts = posts.filter(image_variants__isnull=True)
+        post_ids = posts.values_list('pk', flat=True).distinct()
+        total = 0
+        for post_id in post_ids.iterator():
+            thumbnails.generate(post_id)
+            total += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработаны картинки {total} публикаций.')
+        )
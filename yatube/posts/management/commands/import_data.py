@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, публикации или комментарии из файла CSV или '
+        'JSON Lines пачками; после сбоя продолжает с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями.')
+        parser.add_argument(
+            '--model', choices=transfer.TRANSFERS, required=True,
+            help='Что загружать.',
+        )
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS,
+            help='Формат файла (по умолчанию по расширению).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+            help='Записей в одной транзакции.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала файла, забыв прошлый запуск.',
+        )
+
+    def handle(self, *args, **options):
+        def report(loaded, rate):
+            if options['verbosity'] > 0:
+                self.stdout.write(
+                    f'Загружено записей: {loaded} ({rate:.0f} в секунду).'
+                )
+
+        try:
+            loaded, seconds = transfer.import_records(
+                options['model'], options['path'], options['format'],
+                batch_size=options['batch_size'],
+                restart=options['restart'], report=report,
+            )
+        except (OSError, transfer.TransferError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {loaded} за {seconds:.1f} с '
+            f'({loaded / seconds:.0f} в секунду).'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит поисковый индекс публикаций. Нужна после массовой '
+        'загрузки данных в обход сигналов и после смены SEARCH_BACKEND.'
+    )
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано публикаций: {indexed} ({backend.name}).'
+        ))
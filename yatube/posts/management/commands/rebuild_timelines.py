@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты нужно пересобрать (по умолчанию все).',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(
+            Q(follower__isnull=False) | Q(timeline__isnull=False)
+        ).distinct()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            timeline.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано лент подписок: {rebuilt}.')
+        )
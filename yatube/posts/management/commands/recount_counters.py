@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import stats
+from posts.models import Comment, Like, Post
+
+
+def count_subquery(model):
+    """Подзапрос с количеством связанных с публикацией объектов."""
+    counts = (
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_counters(posts=None):
+    """Пересчитывает счетчики комментариев и лайков одним запросом."""
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.update(
+        comments_count=count_subquery(Comment),
+        likes_count=count_subquery(Like),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает с нуля счетчики комментариев и лайков публикаций '
+        'и статистику авторов.'
+    )
+
+    def handle(self, *args, **options):
+        updated = recount_counters()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитаны счетчики {updated} публикаций.')
+        )
+        updated = stats.recount()
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитана статистика {updated} авторов.')
+        )
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:07
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+
+    def count_subquery(model_name):
+        model = apps.get_model('posts', model_name)
+        counts = (
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by().values('post').annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Post.objects.update(
+        comments_count=count_subquery('Comment'),
+        likes_count=count_subquery('Like'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_like'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:14
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    Like = apps.get_model('posts', 'Like')
+    Post = apps.get_model('posts', 'Post')
+    duplicates = (
+        Like.objects.order_by().values('user', 'post')
+        .annotate(first_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    post_ids = set()
+    for duplicate in duplicates:
+        Like.objects.filter(
+            user=duplicate['user'], post=duplicate['post'],
+        ).exclude(pk=duplicate['first_id']).delete()
+        post_ids.add(duplicate['post'])
+    likes = (
+        Like.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post').annotate(total=Count('pk'))
+        .values('total')
+    )
+    Post.objects.filter(pk__in=post_ids).update(
+        likes_count=Subquery(likes, output_field=IntegerField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_likes, migrations.RunPython.noop,
+        ),
+        migrations.AlterModelOptions(
+            name='like',
+            options={'verbose_name': 'Лайк', 'verbose_name_plural': 'Лайки'},
+        ),
+        migrations.RemoveIndex(
+            model_name='like',
+            name='like_user_post_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique like'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_authorstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(max_length=10, verbose_name='Формат')),
+                ('width', models.PositiveIntegerField(verbose_name='Ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='Высота')),
+                ('image', models.ImageField(upload_to='posts/variants/', verbose_name='Картинка')),
+                ('size', models.PositiveIntegerField(verbose_name='Размер, байт')),
+                ('source_size', models.PositiveIntegerField(verbose_name='Размер оригинала, байт')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='posts.Post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'Вариант картинки',
+                'verbose_name_plural': 'Варианты картинок',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Миграция не зависит от кода приложения: таблица FTS5 создается здесь,
+# а заполняется командой rebuild_search_index, которая использует
+# актуальный стеммер и бэкенд поиска.
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        if ('ENABLE_FTS5',) not in cursor.fetchall():
+            return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+        'USING fts5(terms, filters)'
+    )
+    # Ранг - BM25 только по тексту, метки фильтров на него не влияют.
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+        "VALUES ('rank', 'bm25(1.0, 0.0)')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('count', models.PositiveSmallIntegerField(default=1, verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'Поисковый термин',
+                'verbose_name_plural': 'Поисковые термины',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique search term'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
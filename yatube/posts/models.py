@@ -1,11 +1,31 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 MODEL_STR_LEN: int = 15
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def with_engagement(self, user):
+        """Добавляет к публикациям признак is_liked_by_me для user.
+
+        Количество лайков и комментариев хранится в самих публикациях,
+        поэтому вся карточка поста загружается одним запросом.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_liked_by_me=models.Value(
+                    False, output_field=models.BooleanField(),
+                ),
+            )
+        return self.annotate(
+            is_liked_by_me=models.Exists(
+                Like.objects.filter(post=models.OuterRef('pk'), user=user)
+            ),
+        )
+
+
 class Post(models.Model):
     """Модель публикаций."""
 
@@ -30,9 +50,30 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество комментариев',
+    )
+    likes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество лайков',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+        ]
         verbose_name = 'Публикация'
         verbose_name_plural = 'Публикации'
 
@@ -78,7 +119,13 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -106,6 +153,25 @@ class Follow(models.Model):
         verbose_name_plural = 'Подписки'
 
 
+class LikeQuerySet(models.QuerySet):
+    def toggle(self, user, post):
+        """Ставит лайк, если его не было, иначе снимает.
+
+        Возвращает новое состояние лайка. Повторная вставка при двойном
+        клике отсекается уникальным ограничением.
+        """
+        with transaction.atomic():
+            deleted, _ = self.filter(user=user, post=post).delete()
+            if deleted:
+                return False
+            try:
+                with transaction.atomic():
+                    self.create(user=user, post=post)
+            except IntegrityError:
+                pass
+            return True
+
+
 class Like(models.Model):
     user = models.ForeignKey(
         User, related_name='liked',
@@ -114,4 +180,148 @@ class Like(models.Model):
     post = models.ForeignKey(
         Post, related_name='likes',
         on_delete=models.CASCADE, verbose_name='Лайкнутый пост',
-    )
\ No newline at end of file
+    )
+
+    objects = LikeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique like',
+            )
+        ]
+        verbose_name = 'Лайк'
+        verbose_name_plural = 'Лайки'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User, related_name='timeline',
+        on_delete=models.CASCADE, verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post, related_name='timeline_entries',
+        on_delete=models.CASCADE, verbose_name='Публикация',
+    )
+    author = models.ForeignKey(
+        User, related_name='+',
+        on_delete=models.CASCADE, verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique timeline entry',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+
+
+class AuthorStats(models.Model):
+    """Счетчики публикаций и подписок пользователя."""
+
+    user = models.OneToOneField(
+        User, primary_key=True, related_name='stats',
+        on_delete=models.CASCADE, verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Публикаций',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписок',
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки публикации в современном формате."""
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='image_variants', verbose_name='Публикация',
+    )
+    format = models.CharField('Формат', max_length=10)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    image = models.ImageField(
+        'Картинка', upload_to='posts/variants/',
+    )
+    size = models.PositiveIntegerField('Размер, байт')
+    source_size = models.PositiveIntegerField('Размер оригинала, байт')
+
+    class Meta:
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+
+    def __str__(self):
+        return f'{self.format} {self.width}w'
+
+    @property
+    def saved(self):
+        """Сколько байт экономит вариант по сравнению с оригиналом."""
+        return self.source_size - self.size
+
+
+class SearchTerm(models.Model):
+    """Запись запасного поискового индекса: основа слова в публикации."""
+
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='search_terms', verbose_name='Публикация',
+    )
+    count = models.PositiveSmallIntegerField('Число вхождений', default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique search term',
+            )
+        ]
+        verbose_name = 'Поисковый термин'
+        verbose_name_plural = 'Поисковые термины'
+
+    def __str__(self):
+        return self.term
+
+
+class ImportProgress(models.Model):
+    """Сколько записей файла импорта уже загружено в базу.
+
+    Обновляется в одной транзакции с пачкой записей, поэтому после сбоя
+    импорт продолжается ровно с первой не загруженной записи.
+    """
+
+    source = models.CharField('Источник', max_length=255, unique=True)
+    records = models.PositiveIntegerField('Загружено записей', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Ход импорта'
+        verbose_name_plural = 'Ход импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.records}'
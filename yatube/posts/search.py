@@ -0,0 +1,315 @@
+"""Полнотекстовый поиск по публикациям.
+
+Текст публикации разбивается на слова, слова приводятся к основе
+стеммером Snowball, и по основам строится обратный индекс. Поэтому
+запрос «книгами» находит и «книга», и «книги». Все слова запроса
+должны встретиться в публикации; найденное ранжируется по BM25.
+
+На SQLite с FTS5 индекс хранится в виртуальной таблице posts_post_fts:
+основы в колонке terms, метки автора и группы в колонке filters, так
+что фильтры тоже обслуживает индекс. На остальных базах, или если
+SQLite собран без FTS5, работает запасной индекс на Python: таблица
+SearchTerm с парами «основа - публикация» и ранжирование в коде.
+Бэкенд выбирается настройкой SEARCH_BACKEND.
+
+Частые слова встречаются в сотнях тысяч публикаций, поэтому ранжируются
+только MAX_RESULTS самых новых совпадений: время запроса не растет
+вместе с базой. Индекс обновляется сигналами сохранения и удаления
+публикаций; после массовой загрузки его пересобирает команда
+rebuild_search_index.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from core.stemming import stem
+from posts.models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+MAX_RESULTS: int = 1000
+BATCH_SIZE: int = 1000
+TERM_MAX_LENGTH: int = 64
+# Словарь живого текста невелик, и одни и те же слова повторяются
+# постоянно: основы выгоднее запоминать, чем вычислять заново.
+STEM_CACHE_SIZE: int = 100000
+DOCUMENTS_TIMEOUT: int = 60 * 60
+# Параметры BM25 запасного индекса; длина публикаций не учитывается.
+BM25_K1: float = 1.2
+WORD = re.compile(r'\w+')
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'все', 'да', 'для', 'до', 'его',
+    'ее', 'если', 'же', 'за', 'и', 'из', 'или', 'им', 'их', 'к', 'как',
+    'ли', 'мы', 'на', 'над', 'не', 'нет', 'ни', 'но', 'о', 'об', 'от',
+    'по', 'под', 'при', 'с', 'со', 'так', 'то', 'ты', 'у', 'уже', 'что',
+    'чтобы', 'это', 'я',
+))
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem_word(word):
+    return stem(word)[:TERM_MAX_LENGTH]
+
+
+def terms(text):
+    """Основы слов текста без стоп-слов, в порядке следования."""
+    words = WORD.findall(text.lower().replace('ё', 'е'))
+    return [stem_word(word) for word in words if word not in STOP_WORDS]
+
+
+def filter_tokens(author_id=None, group_id=None):
+    tokens = []
+    if author_id is not None:
+        tokens.append(f'a{author_id}')
+    if group_id is not None:
+        tokens.append(f'g{group_id}')
+    return tokens
+
+
+def reader():
+    return connections[router.db_for_read(Post)]
+
+
+def writer():
+    return connections[router.db_for_write(Post)]
+
+
+class FTS5Backend:
+    """Индекс в виртуальной таблице FTS5."""
+
+    name = 'fts5'
+    # Есть ли таблица индекса в базе; проверяется один раз на процесс.
+    tables = {}
+
+    @classmethod
+    def available(cls):
+        db = reader()
+        if db.vendor != 'sqlite':
+            return False
+        database = db.settings_dict['NAME']
+        if database not in cls.tables:
+            with db.cursor() as cursor:
+                cls.tables[database] = (
+                    FTS_TABLE in db.introspection.table_names(cursor)
+                )
+        return cls.tables[database]
+
+    def index(self, rows):
+        """Добавляет или заменяет публикации (pk, text, author, group)."""
+        with writer().cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, terms, filters) '
+                'VALUES (%s, %s, %s)',
+                [
+                    (
+                        pk, ' '.join(terms(text)),
+                        ' '.join(filter_tokens(author_id, group_id)),
+                    )
+                    for pk, text, author_id, group_id in rows
+                ],
+            )
+
+    def remove(self, post_ids):
+        with writer().cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in post_ids],
+            )
+
+    def clear(self):
+        with writer().cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, query_terms, author_id=None, group_id=None):
+        # Основы состоят только из букв и цифр, а кавычки не дают
+        # принять их за операторы FTS5 вроде AND и NOT.
+        match = ' AND '.join(f'"{term}"' for term in query_terms)
+        match = f'terms : ({match})'
+        for token in filter_tokens(author_id, group_id):
+            match += f' AND filters : "{token}"'
+        with reader().cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM ('
+                f'SELECT rowid, rank FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s'
+                ') ORDER BY rank, rowid DESC',
+                [match, MAX_RESULTS],
+            )
+            return [pk for pk, in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """Запасной индекс в таблице SearchTerm с ранжированием на Python."""
+
+    name = 'index'
+
+    @staticmethod
+    def available():
+        return True
+
+    def index(self, rows):
+        rows = list(rows)
+        self.remove(pk for pk, *_ in rows)
+        SearchTerm.objects.bulk_create(
+            [
+                SearchTerm(term=term, post_id=pk, count=count)
+                for pk, text, *_ in rows
+                for term, count in Counter(terms(text)).items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    def remove(self, post_ids):
+        SearchTerm.objects.filter(post__in=list(post_ids)).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def search(self, query_terms, author_id=None, group_id=None):
+        frequency = self.document_frequency(set(query_terms))
+        # Ведет самая редкая основа: ее записи читаются по индексу
+        # (term, post_id) от новых публикаций к старым, а остальные
+        # основы проверяются по тому же индексу для каждой. Поиск
+        # останавливается на MAX_RESULTS совпадениях.
+        first, *others = sorted(frequency, key=frequency.get)
+        postings = SearchTerm.objects.filter(term=first)
+        if author_id is not None:
+            postings = postings.filter(post__author_id=author_id)
+        if group_id is not None:
+            postings = postings.filter(post__group_id=group_id)
+        names = {first: 'count'}
+        for number, term in enumerate(others):
+            names[term] = f'count_{number}'
+            postings = postings.annotate(**{names[term]: Subquery(
+                SearchTerm.objects.filter(
+                    post_id=OuterRef('post_id'), term=term,
+                ).values('count')[:1],
+            )}).filter(**{f'{names[term]}__isnull': False})
+        rows = postings.order_by('-post_id').values_list(
+            'post_id', *names.values(),
+        )[:MAX_RESULTS]
+        matches = {
+            pk: dict(zip(names, counts)) for pk, *counts in rows
+        }
+
+        documents = cache.get_or_set(
+            'search:documents', Post.objects.count, DOCUMENTS_TIMEOUT,
+        )
+        idf = {
+            term: math.log(1 + (documents - df + 0.5) / (df + 0.5))
+            for term, df in frequency.items()
+        }
+
+        def score(pk):
+            return sum(
+                idf[term] * count * (BM25_K1 + 1) / (count + BM25_K1)
+                for term, count in matches[pk].items()
+            )
+
+        return sorted(matches, key=lambda pk: (-score(pk), -pk))
+
+    @staticmethod
+    def document_frequency(query_terms):
+        """Число публикаций с каждой основой; хранится в кэше."""
+        keys = {term: f'search:df:{term}' for term in query_terms}
+        cached = cache.get_many(keys.values())
+        frequency = {
+            term: cached[key] for term, key in keys.items() if key in cached
+        }
+        missing = query_terms - set(frequency)
+        if missing:
+            counted = dict.fromkeys(missing, 0)
+            counted.update(
+                SearchTerm.objects.filter(term__in=missing).order_by()
+                .values('term').annotate(documents=Count('pk'))
+                .values_list('term', 'documents')
+            )
+            cache.set_many(
+                {keys[term]: df for term, df in counted.items()},
+                DOCUMENTS_TIMEOUT,
+            )
+            frequency.update(counted)
+        return frequency
+
+
+BACKENDS = {
+    backend.name: backend for backend in (FTS5Backend, InvertedIndexBackend)
+}
+
+
+def get_backend():
+    """Бэкенд из SEARCH_BACKEND или запасной, если тот недоступен."""
+    backend = BACKENDS[settings.SEARCH_BACKEND]
+    if not backend.available():
+        backend = InvertedIndexBackend
+    return backend()
+
+
+def index_post(post):
+    get_backend().index(
+        [(post.pk, post.text, post.author_id, post.group_id)],
+    )
+
+
+def remove_post(post_id):
+    get_backend().remove([post_id])
+
+
+@transaction.atomic
+def rebuild(posts=None):
+    """Заново строит индекс по всем публикациям или по posts.
+
+    Пока идет пересборка, поиск работает по старому индексу.
+    """
+    backend = get_backend()
+    if posts is None:
+        backend.clear()
+        posts = Post.objects.all()
+    rows = posts.order_by().values_list('pk', 'text', 'author_id', 'group_id')
+    indexed = 0
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            backend.index(batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        backend.index(batch)
+    return indexed + len(batch)
+
+
+class SearchResults:
+    """Найденные публикации для Paginator.
+
+    Хранит только идентификаторы; публикации загружаются из queryset
+    для одной запрошенной страницы и в порядке ранжирования.
+    """
+
+    def __init__(self, post_ids, queryset):
+        self.post_ids = post_ids
+        self.queryset = queryset
+
+    def count(self):
+        return len(self.post_ids)
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def __getitem__(self, index):
+        post_ids = self.post_ids[index]
+        posts = self.queryset.in_bulk(post_ids)
+        return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def search(query, author_id=None, group_id=None):
+    """Идентификаторы найденных публикаций, самые подходящие первыми."""
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    return get_backend().search(query_terms, author_id, group_id)
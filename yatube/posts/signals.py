@@ -0,0 +1,146 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from posts import caching, feeds, search, stats, thumbnails, timeline
+from posts.models import AuthorStats, Comment, Follow, Group, Like, Post
+
+User = get_user_model()
+
+# Публикации, удаляемые в текущем потоке. Их комментарии и лайки
+# удаляются каскадом, и пересчитывать счетчики самой публикации
+# для каждого из них незачем.
+deleting = threading.local()
+
+
+def deleting_post_ids():
+    if not hasattr(deleting, 'post_ids'):
+        deleting.post_ids = set()
+    return deleting.post_ids
+
+
+def change_counter(post_id, field, delta):
+    """Атомарно изменяет счетчик публикации на delta."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    posts.update(**{field: F(field) + delta})
+
+
+def bump_post(post_id):
+    """Инвалидирует кэш лент, в которых показывается публикация."""
+    post = Post.objects.filter(pk=post_id).values('author_id', 'group_id')
+    for fields in post:
+        caching.bump(*caching.post_scopes(**fields, post_id=post_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(instance.post_id, 'comments_count', 1)
+        bump_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_post_ids():
+        return
+    change_counter(instance.post_id, 'comments_count', -1)
+    bump_post(instance.post_id)
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(instance.post_id, 'likes_count', 1)
+        bump_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_post_ids():
+        return
+    change_counter(instance.post_id, 'likes_count', -1)
+    bump_post(instance.post_id)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    instance.previous_group_id = instance.previous_image = None
+    if instance.pk is not None:
+        instance.previous_group_id, instance.previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image',
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+        stats.change(instance.author_id, 'posts_count', 1)
+    if instance.image and instance.image.name != instance.previous_image:
+        thumbnails.schedule(instance)
+    search.index_post(instance)
+    scopes = caching.post_scopes(
+        instance.author_id, instance.group_id, instance.pk,
+    )
+    feed_scopes = caching.post_scopes(instance.author_id, instance.group_id)
+    if instance.previous_group_id not in (None, instance.group_id):
+        scopes.append(caching.group_scope(instance.previous_group_id))
+        feed_scopes.append(caching.group_scope(instance.previous_group_id))
+    caching.bump(*scopes)
+    feeds.changed(*feed_scopes)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting_post_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_post_ids().discard(instance.pk)
+    search.remove_post(instance.pk)
+    stats.change(instance.author_id, 'posts_count', -1)
+    caching.bump(*caching.post_scopes(
+        instance.author_id, instance.group_id, instance.pk,
+    ))
+    feeds.changed(*caching.post_scopes(instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        stats.change(instance.author_id, 'followers_count', 1)
+        stats.change(instance.user_id, 'following_count', 1)
+        timeline.followers_changed(instance.author_id, followed=True)
+        caching.bump(caching.user_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    stats.change(instance.author_id, 'followers_count', -1)
+    stats.change(instance.user_id, 'following_count', -1)
+    timeline.followers_changed(instance.author_id, followed=False)
+    caching.bump(caching.user_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    caching.bump(caching.group_scope(instance.pk))
+    feeds.changed(caching.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
@@ -0,0 +1,90 @@
+"""Статистика авторов: число публикаций, подписчиков и подписок.
+
+Счетчики хранятся в AuthorStats и меняются по одному при записи,
+а шаблоны читают их из кэша, не обращаясь к базе.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import caching
+from posts.models import AuthorStats, Follow, Post
+
+STATS_CACHE_TIMEOUT: int = 60 * 60
+STATS_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+User = get_user_model()
+
+
+def stats_key(user_id):
+    return f'author_stats:{user_id}'
+
+
+def change(user_id, field, delta):
+    """Атомарно изменяет счетчик пользователя и обновляет его кэш.
+
+    Отсутствующая запись не создается: ее соберет с нуля первое чтение.
+    """
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    stats.update(**{field: F(field) + delta})
+    fresh = AuthorStats.objects.filter(user_id=user_id).values(
+        *STATS_FIELDS,
+    ).first()
+    if fresh is None:
+        cache.delete(stats_key(user_id))
+    else:
+        cache.set(stats_key(user_id), fresh, STATS_CACHE_TIMEOUT)
+    caching.bump(caching.stats_scope(user_id))
+
+
+def count_subquery(queryset, field):
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount(users=None):
+    """Пересчитывает статистику пользователей с нуля."""
+    if users is None:
+        users = User.objects.all()
+    rows = users.annotate(
+        posts_total=count_subquery(Post.objects.all(), 'author'),
+        followers_total=count_subquery(Follow.objects.all(), 'author'),
+        following_total=count_subquery(Follow.objects.all(), 'user'),
+    ).values_list('pk', 'posts_total', 'followers_total', 'following_total')
+    updated = 0
+    for user_id, posts, followers, following in rows.iterator():
+        AuthorStats.objects.update_or_create(
+            user_id=user_id,
+            defaults={
+                'posts_count': posts,
+                'followers_count': followers,
+                'following_count': following,
+            },
+        )
+        cache.delete(stats_key(user_id))
+        updated += 1
+    return updated
+
+
+def get_stats(user_id):
+    """Статистика пользователя в виде словаря, по возможности из кэша."""
+    key = stats_key(user_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = AuthorStats.objects.filter(user_id=user_id).values(
+            *STATS_FIELDS,
+        ).first()
+        if stats is None:
+            recount(User.objects.filter(pk=user_id))
+            stats = AuthorStats.objects.filter(user_id=user_id).values(
+                *STATS_FIELDS,
+            ).first() or dict.fromkeys(STATS_FIELDS, 0)
+        cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.stats import get_stats
+
+register = template.Library()
+
+
+@register.simple_tag
+def get_author_stats(user):
+    """Тег, возвращающий статистику пользователя из кэша."""
+    return get_stats(user.pk)
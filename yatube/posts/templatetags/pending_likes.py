@@ -0,0 +1,12 @@
+from django import template
+
+from posts.likes import overlay
+
+register = template.Library()
+
+
+@register.simple_tag
+def pending_likes(page_obj, user):
+    """Тег, накладывающий еще не записанные лайки на публикации страницы."""
+    overlay(page_obj, user)
+    return ''
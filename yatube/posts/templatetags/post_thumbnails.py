@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import post_image
+
+register = template.Library()
+
+
+@register.simple_tag(name='post_image')
+def post_image_tag(post):
+    """Тег, возвращающий готовые варианты картинки публикации или None."""
+    return post_image(post)
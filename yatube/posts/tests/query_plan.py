@@ -0,0 +1,53 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)(?!.* USING )')
+TEMP_BTREE = 'USE TEMP B-TREE'
+
+
+def explain(sql):
+    """План выполнения запроса SQLite в виде списка строк."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql, allowed_tables=()):
+    """Полные сканирования таблиц и сортировки во временном B-дереве.
+
+    Сканирование производных таблиц (подзапросов) проблемой не считается.
+    """
+    tables = set(connection.introspection.table_names()) - set(allowed_tables)
+    problems = []
+    for step in explain(sql):
+        scan = FULL_SCAN.match(step)
+        if scan and scan.group('table') in tables:
+            problems.append(step)
+        elif step.startswith(TEMP_BTREE):
+            problems.append(step)
+    return problems
+
+
+class QueryPlanMixin:
+    """Проверка того, что запросы представлений используют индексы."""
+
+    @contextmanager
+    def assertIndexedQueries(self, allowed_tables=()):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN поддерживается только SQLite.')
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        failures = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for problem in plan_problems(sql, allowed_tables):
+                failures.append(f'{problem}\n    {sql}')
+        if failures:
+            self.fail(
+                'Запросы без подходящего индекса:\n' + '\n'.join(failures)
+            )
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Like, Post
+from posts.utils import EstimatedCountPaginator, estimated_count
+
+User = get_user_model()
+
+ADMIN_POSTS_QTY: int = 3
+
+
+class AdminTests(TestCase):
+    """Тестирование списков админки для больших таблиц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group,
+                text=f'Книга номер {i}' if i else 'Кошка спит',
+            )
+            for i in range(ADMIN_POSTS_QTY)
+        ]
+        for post in cls.posts:
+            Comment.objects.create(post=post, author=cls.admin, text='Да')
+            Like.objects.create(post=post, user=cls.admin)
+        Follow.objects.create(user=cls.admin, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'admin:posts_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'], len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Список загружает связанные строки без запроса на строку."""
+        models = (Post, Comment, Like, Follow)
+        before = {model: self.changelist(model)[1] for model in models}
+        Post.objects.create(author=self.author, group=self.group, text='Еще')
+        Comment.objects.create(post=self.posts[0], author=self.author, text='')
+        Like.objects.create(post=self.posts[0], user=self.author)
+        Follow.objects.create(user=self.author, author=self.admin)
+        for model in models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.changelist(model)[1], before[model])
+
+    def test_search(self):
+        """Поиск идет по полнотекстовому индексу и точным совпадениям."""
+        cl, _ = self.changelist(Post, q='книгу')
+        self.assertEqual(set(cl.result_list), set(self.posts[1:]))
+        cl, _ = self.changelist(Post, q='author')
+        self.assertEqual(len(cl.result_list), ADMIN_POSTS_QTY)
+        cl, _ = self.changelist(Comment, q=str(self.posts[0].pk))
+        self.assertEqual(
+            [comment.post_id for comment in cl.result_list],
+            [self.posts[0].pk],
+        )
+        cl, _ = self.changelist(Like, q='auth')
+        self.assertEqual(list(cl.result_list), [])
+        cl, _ = self.changelist(Follow, q='author')
+        self.assertEqual(len(cl.result_list), 1)
+
+    def test_estimated_count(self):
+        """Без фильтров число строк большой таблицы оценивается."""
+        Post.objects.filter(pk=self.posts[0].pk).delete()
+        last_pk = self.posts[-1].pk
+        self.assertEqual(estimated_count(Post, DEFAULT_DB_ALIAS), last_pk)
+        with override_settings(ESTIMATED_COUNT_THRESHOLD=0):
+            paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+            self.assertEqual(paginator.count, last_pk)
+            paginator = EstimatedCountPaginator(
+                Post.objects.filter(author=self.author), 10,
+            )
+            self.assertEqual(paginator.count, ADMIN_POSTS_QTY - 1)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, ADMIN_POSTS_QTY - 1)
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+API_POSTS_QTY: int = 3
+
+
+class ApiTests(TestCase):
+    """Тестирование JSON API лент и условных запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}',
+            )
+            for i in range(API_POSTS_QTY)
+        ]
+        Comment.objects.create(
+            post=cls.posts[-1], author=cls.reader, text='Комментарий',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = self.client_class()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """Ленты отдают выбранные поля и листаются курсором."""
+        feeds = (
+            (self.client, reverse('posts:api_index')),
+            (self.client, reverse('posts:api_group_posts', args=('group',))),
+            (self.client, reverse(
+                'posts:api_profile_posts', args=('author',),
+            )),
+            (self.reader_client, reverse('posts:api_follow')),
+        )
+        expected = [post.pk for post in reversed(self.posts)]
+        for client, url in feeds:
+            with self.subTest(url=url):
+                data = client.get(url, {'fields': 'id,author', 'limit': 2})
+                data = data.json()
+                self.assertEqual(data['results'], [
+                    {'id': pk, 'author': 'author'} for pk in expected[:2]
+                ])
+                self.assertIsNone(data['previous'])
+                data = client.get(url, {
+                    'fields': 'id', 'limit': 2, 'cursor': data['next'],
+                }).json()
+                self.assertEqual(data['results'], [{'id': expected[2]}])
+                self.assertIsNone(data['next'])
+
+    def test_errors(self):
+        """Ошибки запроса отдаются в JSON."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json()['errors'])
+        self.assertEqual(
+            self.client.get(url, {'limit': 1000}).status_code, 400,
+        )
+        self.assertEqual(self.client.post(url).status_code, 405)
+        response = self.client.get(
+            reverse('posts:api_group_posts', args=('missing',)),
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('errors', response.json())
+        response = self.client.get(reverse('posts:api_follow'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_etag(self):
+        """Неизменная лента отвечает 304 без запросов к базе."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, {'limit': 1}, HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = 'Измененный текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified(self):
+        """Last-Modified - дата самой новой публикации ленты."""
+        url = reverse('posts:api_index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_detail(self):
+        """Публикация отдается с комментариями; комментарий меняет ETag."""
+        post = self.posts[-1]
+        url = reverse('posts:api_post', args=(post.pk,))
+        response = self.reader_client.get(url, {'fields': 'id,text'})
+        data = response.json()
+        self.assertEqual(data['id'], post.pk)
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий'],
+        )
+        etag = response['ETag']
+        self.assertEqual(self.reader_client.get(
+            url, {'fields': 'id,text'}, HTTP_IF_NONE_MATCH=etag,
+        ).status_code, 304)
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        response = self.reader_client.get(
+            url, {'fields': 'id,text'}, HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(len(response.json()['comments']['results']), 2)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:api_post', args=(0,)),
+            ).status_code, 404,
+        )
@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import shutil
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import archive
+from posts.models import Comment, Like, Post
+from posts.tests.test_views import TEMP_MEDIA_ROOT
+
+User = get_user_model()
+
+IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21'
+    b'\xf9\x04\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00'
+    b'\x01\x00\x00\x02\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ArchiveTests(TestCase):
+    """Тестирование архива данных пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(
+            author=cls.user, text='С картинкой',
+            image=SimpleUploadedFile('archive.gif', IMAGE, 'image/gif'),
+        )
+        Post.objects.create(author=cls.user, text='Без картинки')
+        other_post = Post.objects.create(author=cls.other, text='Чужой')
+        Comment.objects.create(post=other_post, author=cls.user, text='Да')
+        Comment.objects.create(post=cls.post, author=cls.other, text='Нет')
+        Like.objects.create(post=other_post, user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def read_lines(self, zip_file, name):
+        return [json.loads(line) for line in zip_file.open(name)]
+
+    def test_download(self):
+        """Архив отдается потоком и содержит только данные пользователя."""
+        response = self.client.get(reverse('posts:archive'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        data = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+            posts = self.read_lines(zip_file, 'posts.jsonl')
+            self.assertEqual(
+                [post['text'] for post in posts],
+                ['С картинкой', 'Без картинки'],
+            )
+            comments = self.read_lines(zip_file, 'comments.jsonl')
+            self.assertEqual([comment['text'] for comment in comments], ['Да'])
+            self.assertEqual(len(self.read_lines(zip_file, 'likes.jsonl')), 1)
+            self.assertEqual(
+                zip_file.read(f'media/{posts[0]["image"]}'), IMAGE,
+            )
+
+    def test_background_archive(self):
+        """Фоновый архив пишется в MEDIA_ROOT и заменяет прежний."""
+        first = archive.write_archive(self.user.pk)
+        second = archive.write_archive(self.user.pk)
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(zipfile.is_zipfile(second))
+        url = archive.ready_archive(self.user.pk)
+        self.assertTrue(url.endswith(os.path.basename(second)))
+        response = self.client.get(
+            reverse('posts:user_account', args=(self.user.username,)),
+        )
+        self.assertEqual(response.context['archive_url'], url)
+        self.assertIsNone(archive.ready_archive(self.other.pk))
+
+    def test_archive_request(self):
+        """Заказ архива принимается только POST и не чаще интервала."""
+        url = reverse('posts:archive_request')
+        self.assertEqual(self.client.get(url).status_code, 405)
+        response = self.client.post(url, follow=True)
+        self.assertRedirects(
+            response,
+            reverse('posts:user_account', args=(self.user.username,)),
+        )
+        self.assertContains(response, 'Архив собирается')
+        self.assertFalse(archive.schedule_archive(self.user.pk))
+        allowed = archive.next_request_time(self.user.pk)
+        response = self.client.post(url, follow=True)
+        self.assertContains(response, 'Архив уже заказан недавно.')
+        self.assertContains(
+            response, f'после {timezone.localtime(allowed):%H:%M}',
+        )
+        self.assertIsNone(archive.next_request_time(self.other.pk))
@@ -0,0 +1,63 @@
+import copy
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posts import benchmarks
+from posts.models import Post, TimelineEntry
+
+
+class BenchmarkTests(TestCase):
+    """Проверка набора нагрузочных замеров на минимальном объеме данных."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.loaded = benchmarks.seed('tiny')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed(self):
+        """Синтетические данные загружены, счетчики и ленты заполнены."""
+        sizes = benchmarks.SCALES['tiny']
+        self.assertEqual(self.loaded['users'], sizes['users'])
+        self.assertEqual(self.loaded['posts'], sizes['posts'])
+        self.assertTrue(Post.objects.filter(likes_count__gt=0).exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_measure_and_compare(self):
+        """Замер покрывает все сценарии, а сравнение находит регрессии."""
+        results = benchmarks.measure(requests=3, warmup=1, rounds=1)
+        self.assertEqual(set(results['scenarios']), set(benchmarks.SCENARIOS))
+        for scenario, metrics in results['scenarios'].items():
+            with self.subTest(scenario=scenario):
+                self.assertEqual(metrics['errors'], 0)
+                self.assertGreater(metrics['max_queries'], 0)
+        self.assertEqual(benchmarks.compare(results, results), [])
+
+        baseline = copy.deepcopy(results)
+        baseline['scenarios']['index']['max_queries'] -= 1
+        regressions = benchmarks.compare(results, baseline)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('index', regressions[0])
+
+    def test_refuses_shared_cache(self):
+        """Замер не запускается на общем кэше сервера."""
+        shared = {'default': {
+            **settings.CACHES['default'],
+            'LOCATION': os.path.join(settings.BASE_DIR, 'cache.sqlite3'),
+        }}
+        with override_settings(CACHES=shared):
+            with self.assertRaisesMessage(ValueError, 'CACHE_LOCATION'):
+                benchmarks.check_cache()
+
+    def test_percentile(self):
+        """Процентиль считается по ближайшему рангу."""
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(benchmarks.percentile(values, 50), 3)
+        self.assertEqual(benchmarks.percentile(values, 99), 5)
+        self.assertEqual(benchmarks.percentile(values, 1), 1)
+        self.assertEqual(benchmarks.percentile([7], 99), 7)
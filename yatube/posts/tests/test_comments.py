@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.views import COMMENTS_MAX
+
+User = get_user_model()
+
+EXTRA_COMMENTS: int = 5
+
+
+class CommentPaginationTests(TestCase):
+    """Тестирование постраничных комментариев публикации."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(COMMENTS_MAX + EXTRA_COMMENTS)
+        ])
+        cls.expected = list(
+            cls.post.comments.order_by('-created', '-id').values_list(
+                'pk', flat=True,
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_inline(self):
+        """Страница публикации показывает только первые комментарии."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            self.expected[:COMMENTS_MAX],
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'more-comments')
+
+    def test_next_pages(self):
+        """Следующие комментарии подгружаются фрагментом по курсору."""
+        first = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:comments', args=(self.post.pk,)),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments_page.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            self.expected[COMMENTS_MAX:],
+        )
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, 'more-comments')
+        response = self.client.get(
+            reverse('posts:comments', args=(0,)),
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(ANONYMOUS_MAX_AGE=30)
+class ConditionalPageTests(TestCase):
+    """Тестирование ответов 304 и заголовков кэширования страниц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост',
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Другой пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = self.client_class()
+        self.reader_client.force_login(self.reader)
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def revalidate(self, client, url, response):
+        return client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        ).status_code
+
+    def test_not_modified(self):
+        """Неизменная страница отвечает 304 без отрисовки шаблона."""
+        for client in (self.client, self.reader_client):
+            for url in self.pages:
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    with self.assertTemplateNotUsed('base.html'):
+                        self.assertEqual(
+                            self.revalidate(client, url, response), 304,
+                        )
+
+    def test_writes_change_pages(self):
+        """Запись меняет только страницы, на которых она видна."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        other_url = reverse('posts:post_detail', args=(self.other_post.pk,))
+        detail = self.reader_client.get(url)
+        other = self.reader_client.get(other_url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий',
+        )
+        self.assertEqual(self.revalidate(self.reader_client, url, detail), 200)
+        self.assertEqual(
+            self.revalidate(self.reader_client, other_url, other), 304,
+        )
+        profile_url = reverse('posts:profile', args=(self.author.username,))
+        profile = self.client.get(profile_url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(self.client, profile_url, profile), 200,
+        )
+
+    def test_cache_control(self):
+        """Гостевые страницы кэширует прокси, страницы пользователя - нет."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=30', response['Cache-Control'])
+                response = self.reader_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_post_detail_checked_before_reading(self):
+        """Публикация не читается из базы, если у клиента актуальный ETag."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:post_detail', args=(0,)),
+            ).status_code,
+            404,
+        )
+
+    def test_modified_twice_in_one_second(self):
+        """Запись в ту же секунду не дает 304 по If-Modified-Since."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        Comment.objects.create(post=self.post, author=self.reader, text='1')
+        response = self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.reader, text='2')
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertContains(response, '2')
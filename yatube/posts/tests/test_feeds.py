@@ -0,0 +1,77 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import caching, feeds
+from posts.models import Group, Like, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    """Тестирование лент Atom, RSS и JSON Feed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Цитата в группе',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def urls(self, fmt):
+        return (
+            reverse('posts:feed', args=(fmt,)),
+            reverse('posts:group_feed', args=(self.group.slug, fmt)),
+            reverse('posts:profile_feed', args=(self.author.username, fmt)),
+        )
+
+    def test_formats(self):
+        """Ленты всех областей отдаются во всех форматах."""
+        for fmt, content_type in feeds.CONTENT_TYPES.items():
+            for url in self.urls(fmt):
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response['Content-Type'], content_type)
+                    self.assertContains(response, 'Цитата в группе')
+        data = json.loads(self.client.get(self.urls('json')[1]).content)
+        self.assertEqual(data['title'], 'Группа')
+        self.assertEqual(data['items'][0]['tags'], ['Группа'])
+        self.assertEqual(self.client.get('/feeds/xml/').status_code, 404)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_feed', args=('missing', 'rss')),
+            ).status_code,
+            404,
+        )
+
+    def test_snapshot_and_etag(self):
+        """Снимок отдается без запросов к базе, ETag дает ответ 304."""
+        feeds.rebuild(caching.INDEX)
+        url = reverse('posts:feed', args=('atom',))
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Цитата в группе')
+        self.assertIn('public', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_rebuilt_on_post_change(self):
+        """Новая публикация меняет ленту, а лайк - нет."""
+        url = reverse('posts:profile_feed', args=(self.author.username, 'rss'))
+        etag = self.client.get(url)['ETag']
+        Like.objects.create(post=self.post, user=self.reader)
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+        Post.objects.create(author=self.author, text='Новая цитата')
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Новая цитата')
@@ -0,0 +1,174 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import likes
+from posts.models import Like, Post
+
+User = get_user_model()
+
+
+@override_settings(LIKE_WRITE_BEHIND=True)
+class WriteBehindLikeTests(TestCase):
+    """Тестирование отложенной записи лайков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = self.client_class()
+        self.reader_client.force_login(self.reader)
+        self.other_client = self.client_class()
+        self.other_client.force_login(self.other)
+        self.url = reverse('posts:like_post', args=(self.post.pk,))
+
+    def detail(self, client):
+        response = client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        post = response.context['post']
+        return post.is_liked_by_me, post.likes_count
+
+    def test_toggle_is_buffered(self):
+        """Клик не пишет в базу, но сразу виден в ответах и на страницах."""
+        self.assertEqual(
+            self.reader_client.post(self.url).json(),
+            {'liked': True, 'likes_count': 1},
+        )
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.detail(self.reader_client), (True, 1))
+        self.assertEqual(self.detail(self.other_client), (False, 1))
+        page = self.reader_client.get(reverse('posts:index'))
+        post = page.context['page_obj'][0]
+        self.assertEqual((post.is_liked_by_me, post.likes_count), (True, 1))
+
+    def test_flush(self):
+        """Перенос записывает итог кликов и убирает наложение."""
+        for _ in range(3):
+            self.reader_client.post(self.url)
+        self.other_client.post(self.url)
+        self.assertEqual(likes.flush(), 4)
+        self.assertEqual(
+            set(Like.objects.values_list('user__username', flat=True)),
+            {'reader', 'other'},
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.likes_count, 2)
+        self.assertEqual(self.detail(self.reader_client), (True, 2))
+        self.assertEqual(likes.flush(), 0)
+
+        self.reader_client.post(self.url)
+        self.assertEqual(self.detail(self.reader_client), (False, 1))
+        call_command('flush_likes', stdout=StringIO())
+        self.assertFalse(Like.objects.filter(user=self.reader).exists())
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+        self.assertEqual(self.detail(self.reader_client), (False, 1))
+
+    def test_repeated_toggles_cancel_out(self):
+        """Четное число кликов не меняет базу."""
+        self.reader_client.post(self.url)
+        self.reader_client.post(self.url)
+        self.assertEqual(self.detail(self.reader_client), (False, 0))
+        self.assertEqual(likes.net_changes([
+            (self.reader.pk, self.post.pk, True),
+            (self.reader.pk, self.post.pk, False),
+        ]), {(self.reader.pk, self.post.pk): False})
+        likes.flush()
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).likes_count, 0,
+        )
+
+    def test_toggle_during_flush(self):
+        """Клик, сделанный во время переноса, не теряется."""
+        self.reader_client.post(self.url)
+        apply = likes.apply
+        toggled = []
+
+        def apply_and_toggle(changes):
+            counters = apply(changes)
+            # Лайк уже записан в базу, а состояние еще не снято.
+            if not toggled:
+                liked, _ = likes.toggle(
+                    self.reader, Post.objects.get(pk=self.post.pk),
+                )
+                toggled.append(liked)
+            return counters
+
+        with mock.patch('posts.likes.apply', side_effect=apply_and_toggle):
+            likes.flush()
+        self.assertEqual(toggled, [False])
+        self.assertEqual(
+            cache.get(likes.FLUSHED_KEY), cache.get(likes.SEQUENCE_KEY),
+        )
+        self.assertFalse(Like.objects.filter(user=self.reader).exists())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 0)
+        self.assertEqual(self.detail(self.reader_client), (False, 0))
+
+    def test_toggle_lock(self):
+        """Клик ждет, пока закончится другой клик той же пары."""
+        key = likes.toggle_lock_key(self.reader.pk, self.post.pk)
+        cache.add(key, True)
+        with mock.patch('posts.likes.time.sleep') as sleep:
+            sleep.side_effect = lambda seconds: cache.delete(key)
+            self.reader_client.post(self.url)
+        sleep.assert_called_once_with(likes.TOGGLE_LOCK_WAIT)
+        self.assertIsNone(cache.get(key))
+
+    def test_flush_scheduled_after_journal_entry(self):
+        """Перенос ставится на конец интервала, когда запись уже в журнале."""
+        def check(delay, func):
+            number = cache.get(likes.SEQUENCE_KEY)
+            self.assertIsNotNone(cache.get(likes.journal_key(number)))
+
+        with mock.patch(
+            'posts.likes.tasks.submit_later', side_effect=check,
+        ) as submit_later:
+            self.reader_client.post(self.url)
+            self.other_client.post(self.url)
+            submit_later.assert_called_once_with(
+                settings.LIKE_FLUSH_INTERVAL, likes.scheduled_flush,
+            )
+            likes.scheduled_flush()
+            self.assertEqual(Like.objects.count(), 2)
+            self.assertEqual(submit_later.call_count, 1)
+            self.reader_client.post(self.url)
+            self.assertEqual(submit_later.call_count, 2)
+
+    def test_scheduled_flush_repeats_until_drained(self):
+        """Перенос ставится снова, пока в журнале остаются записи."""
+        with mock.patch('posts.likes.tasks.submit_later') as submit_later:
+            self.reader_client.post(self.url)
+            # Номер выдан, а запись журнала еще не сделана.
+            likes.incr(likes.SEQUENCE_KEY)
+            likes.scheduled_flush()
+            self.assertEqual(submit_later.call_count, 2)
+            likes.scheduled_flush()
+            self.assertEqual(submit_later.call_count, 2)
+        self.assertTrue(Like.objects.filter(user=self.reader).exists())
+
+    def test_lost_entry_does_not_drift(self):
+        """Потерянная запись журнала не остается в числе лайков."""
+        self.reader_client.post(self.url)
+        cache.delete(likes.journal_key(1))
+        self.other_client.post(self.url)
+        self.assertEqual(self.detail(self.other_client), (True, 2))
+        likes.flush()
+        likes.flush()
+        self.assertEqual(
+            list(Like.objects.values_list('user__username', flat=True)),
+            ['other'],
+        )
+        self.assertEqual(self.detail(self.other_client), (True, 1))
@@ -0,0 +1,192 @@
+import shutil
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    Client, TestCase, modify_settings, override_settings,
+)
+from django.urls import resolve, reverse
+
+from core.queries import budget_of
+from posts import thumbnails, urls
+from posts.models import Comment, Follow, Group, Like, Post
+from posts.tests.test_views import TEMP_MEDIA_ROOT
+
+User = get_user_model()
+
+FEED_POSTS: int = 5
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@modify_settings(
+    MIDDLEWARE={'prepend': 'core.middleware.QueryInspectorMiddleware'},
+)
+class QueryBudgetTests(TestCase):
+    """Проверка бюджетов запросов к базе и отсутствия N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        image = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21'
+            b'\xf9\x04\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00'
+            b'\x01\x00\x00\x02\x02\x4c\x01\x00\x3b'
+        )
+        for i in range(FEED_POSTS):
+            post = Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group,
+                image=SimpleUploadedFile('budget.gif', image, 'image/gif'),
+            )
+            thumbnails.generate(post.pk)
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий',
+            )
+            Comment.objects.create(
+                post=post, author=cls.author, text='Ответ',
+            )
+            Like.objects.create(post=post, user=cls.reader)
+        cls.post = post
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_views_declare_budgets(self):
+        """Каждое представление posts объявляет бюджет запросов."""
+        for pattern in urls.urlpatterns:
+            with self.subTest(view=pattern.name):
+                self.assertIsNotNone(
+                    budget_of(pattern.callback),
+                    f'Представление {pattern.name} не объявило бюджет.',
+                )
+
+    def test_views_within_budget(self):
+        """Представления укладываются в бюджет и не выполняют N+1.
+
+        Кэш перед каждым запросом очищается: бюджет рассчитан на
+        худший случай.
+        """
+        post_id = self.post.pk
+        author = self.author.username
+        comment = {'text': 'Комментарий'}
+        requests = (
+            (self.client, 'get', reverse('posts:index'), None),
+            (self.client, 'get', reverse(
+                'posts:group_list', args=(self.group.slug,),
+            ), None),
+            (self.client, 'get', reverse(
+                'posts:profile', args=(author,),
+            ), None),
+            (self.client, 'get', reverse(
+                'posts:post_detail', args=(post_id,),
+            ), None),
+            (self.reader_client, 'get', reverse('posts:index'), None),
+            (self.reader_client, 'get', reverse(
+                'posts:group_list', args=(self.group.slug,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:profile', args=(author,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:post_detail', args=(post_id,),
+            ), None),
+            (self.reader_client, 'get', reverse('posts:follow_index'), None),
+            (self.client, 'get', reverse('posts:search'), {
+                'q': 'пост', 'group': self.group.slug, 'author': author,
+            }),
+            (self.reader_client, 'get', reverse('posts:search'), {
+                'q': 'пост',
+            }),
+            (self.client, 'get', reverse('posts:search_api'), {
+                'q': 'пост', 'group': self.group.slug, 'author': author,
+            }),
+            (self.client, 'get', reverse('posts:api_index'), None),
+            (self.reader_client, 'get', reverse('posts:api_index'), None),
+            (self.reader_client, 'get', reverse(
+                'posts:api_group_posts', args=(self.group.slug,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:api_profile_posts', args=(author,),
+            ), None),
+            (self.reader_client, 'get', reverse('posts:api_follow'), None),
+            (self.client, 'get', reverse(
+                'posts:comments', args=(post_id,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:api_post', args=(post_id,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:user_account', args=(author,),
+            ), None),
+            (self.client, 'get', reverse('posts:feed', args=('atom',)), None),
+            (self.client, 'get', reverse(
+                'posts:group_feed', args=(self.group.slug, 'rss'),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:profile_feed', args=(author, 'json'),
+            ), None),
+            (self.reader_client, 'get', reverse('posts:archive'), None),
+            (self.reader_client, 'post', reverse(
+                'posts:archive_request',
+            ), None),
+            (self.reader_client, 'post', reverse(
+                'posts:add_comment', args=(post_id,),
+            ), comment),
+            (self.reader_client, 'post', reverse(
+                'posts:like_post', args=(post_id,),
+            ), None),
+            (self.reader_client, 'post', reverse(
+                'posts:like_post', args=(post_id,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:profile_unfollow', args=(author,),
+            ), None),
+            (self.reader_client, 'get', reverse(
+                'posts:profile_follow', args=(author,),
+            ), None),
+            (self.author_client, 'get', reverse('posts:post_create'), None),
+            (self.author_client, 'post', reverse(
+                'posts:post_create',
+            ), {'text': 'Новый пост', 'group': self.group.pk}),
+            (self.author_client, 'get', reverse(
+                'posts:post_edit', args=(post_id,),
+            ), None),
+            (self.author_client, 'post', reverse(
+                'posts:post_edit', args=(post_id,),
+            ), {'text': 'Измененный пост'}),
+            (self.author_client, 'get', reverse(
+                'posts:post_delete', args=(post_id,),
+            ), None),
+            (self.author_client, 'post', reverse(
+                'posts:post_delete', args=(post_id,),
+            ), None),
+        )
+        for client, method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                cache.clear()
+                response = getattr(client, method)(url, data)
+                query_log = response.query_log
+                budget = budget_of(resolve(url).func)
+                self.assertLessEqual(
+                    len(query_log), budget,
+                    f'{url}: запросов {len(query_log)} при бюджете {budget}',
+                )
+                self.assertEqual(
+                    query_log.repeated(), [],
+                    f'{url}: повторяющиеся запросы\n{query_log.report()}',
+                )
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Like, Post
+from posts.tests.query_plan import QueryPlanMixin
+
+User = get_user_model()
+
+
+class QueryPlanTests(QueryPlanMixin, TestCase):
+    """Проверка планов запросов представлений."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий',
+        )
+        Like.objects.create(post=cls.post, user=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_views_use_indexes(self):
+        """Представления не сканируют таблицы целиком и не сортируют
+        результаты во временном B-дереве."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:group_list', args=(self.group.slug,)) + '?cursor=',
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:profile', args=(self.author.username,))
+            + '?cursor=',
+            reverse('posts:post_detail', args=(self.post.id,)),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?cursor=',
+            reverse('posts:user_account', args=(self.author.username,)),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                with self.assertIndexedQueries():
+                    self.reader_client.get(page)
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.stemming import stem
+from posts import search
+from posts.models import Group, Post, SearchTerm
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    """Тестирование полнотекстового поиска по публикациям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Книги', slug='books', description='Про книги',
+        )
+        cls.book = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Хорошие книги делают жизнь счастливее.',
+        )
+        cls.books = Post.objects.create(
+            author=cls.other,
+            text='Книга о книгах: книгами не бывает слишком много.',
+        )
+        cls.cat = Post.objects.create(
+            author=cls.author, text='Кошка спит на клавиатуре.',
+        )
+
+    def test_stem(self):
+        """Формы слова приводятся к одной основе."""
+        self.assertEqual(stem('книга'), 'книг')
+        self.assertEqual(stem('книгами'), 'книг')
+        self.assertEqual(stem('Ёлками'), 'елк')
+        self.assertEqual(stem('красивые'), stem('красивая'))
+        self.assertEqual(stem('осторожность'), 'осторожн')
+
+    def test_backends(self):
+        """Оба бэкенда находят словоформы, ранжируют и фильтруют."""
+        for backend in ('fts5', 'index'):
+            with self.subTest(backend=backend), \
+                    override_settings(SEARCH_BACKEND=backend):
+                if backend == 'index':
+                    search.rebuild()
+                self.assertEqual(search.get_backend().name, backend)
+                self.assertEqual(
+                    search.search('книгу'), [self.books.pk, self.book.pk],
+                )
+                self.assertEqual(
+                    search.search('книги жизни'), [self.book.pk],
+                )
+                self.assertEqual(
+                    search.search('книга', author_id=self.other.pk),
+                    [self.books.pk],
+                )
+                self.assertEqual(
+                    search.search('книга', group_id=self.group.pk),
+                    [self.book.pk],
+                )
+                self.assertEqual(search.search('и не на'), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении публикации."""
+        cat = Post.objects.get(pk=self.cat.pk)
+        cat.text = 'Собака спит на диване.'
+        cat.save()
+        self.assertEqual(search.search('кошки'), [])
+        self.assertEqual(search.search('собаки'), [cat.pk])
+        cat.delete()
+        self.assertEqual(search.search('собаки'), [])
+
+    @override_settings(SEARCH_BACKEND='index')
+    def test_inverted_index_follows_changes(self):
+        """Запасной индекс тоже следит за публикациями."""
+        search.rebuild()
+        cat = Post.objects.get(pk=self.cat.pk)
+        cat.text = 'Собака спит на диване.'
+        cat.save()
+        self.assertEqual(search.search('собаки'), [cat.pk])
+        self.assertFalse(SearchTerm.objects.filter(term='кошк').exists())
+
+    @override_settings(SEARCH_BACKEND='index')
+    def test_inverted_index_limit(self):
+        """Запасной индекс отбирает самые новые совпадения одним запросом."""
+        search.rebuild()
+        cache.clear()
+        self.assertEqual(search.search('книга'), [self.books.pk, self.book.pk])
+        with mock.patch('posts.search.MAX_RESULTS', 1), \
+                self.assertNumQueries(1):
+            self.assertEqual(search.search('книга'), [self.books.pk])
+        self.assertEqual(search.search('книги котов'), [])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденное с учетом фильтров."""
+        response = self.client.get(reverse('posts:search'), {'q': 'книгами'})
+        self.assertEqual(
+            list(response.context['page_obj']), [self.books, self.book],
+        )
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'книга', 'group': 'books'},
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.book])
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'книга', 'author': 'nobody'},
+        )
+        self.assertEqual(list(response.context['page_obj']), [])
+        response = self.client.get(reverse('posts:search'))
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_search_api(self):
+        """API поиска отвечает JSON и сообщает об ошибках запроса."""
+        response = self.client.get(
+            reverse('posts:search_api'), {'q': 'кошка', 'author': 'author'},
+        )
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.cat.pk)
+        self.assertEqual(data['results'][0]['author'], 'author')
+        response = self.client.get(reverse('posts:search_api'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q', response.json()['errors'])
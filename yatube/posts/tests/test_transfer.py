@@ -0,0 +1,181 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts import search, thumbnails
+from posts.models import (
+    Comment, Follow, Group, ImportProgress, Post, TimelineEntry,
+)
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    """Тестирование массового импорта и экспорта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание',
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write_jsonl(self, name, records):
+        path = self.path(name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def call(self, command, path, model, **options):
+        out = StringIO()
+        call_command(command, path, model=model, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_posts(self):
+        """Импорт публикаций обновляет поиск, ленты и счетчики."""
+        path = self.write_jsonl('posts.jsonl', [
+            {'text': f'Афоризм номер {number}', 'author': 'author',
+             'group': 'group' if number % 2 else None,
+             'pub_date': f'2020-01-0{number}T10:00:00+00:00'}
+            for number in range(1, 6)
+        ])
+        output = self.call('import_data', path, 'post', batch_size=2)
+        self.assertIn('Загружено записей: 5', output)
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(posts.count(), 5)
+        self.assertEqual(self.group.posts.count(), 3)
+        self.assertEqual(posts.first().pub_date.day, 5)
+        self.assertEqual(
+            set(search.search('афоризм')),
+            set(posts.values_list('pk', flat=True)),
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5,
+        )
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.posts_count, 5,
+        )
+        self.assertFalse(ImportProgress.objects.exists())
+
+    def test_import_schedules_thumbnails(self):
+        """Для публикаций с картинкой ставится построение миниатюр."""
+        path = self.write_jsonl('images.jsonl', [
+            {'text': 'С картинкой', 'author': 'author',
+             'image': 'posts/imported.gif'},
+            {'text': 'Без картинки', 'author': 'author'},
+        ])
+        with mock.patch('posts.thumbnails.tasks.submit') as submit:
+            self.call('import_data', path, 'post')
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual(
+            [c for c in submit.call_args_list
+             if c[0][0] is thumbnails.generate],
+            [mock.call(thumbnails.generate, post.pk)],
+        )
+
+    def test_resume_after_error(self):
+        """После ошибки импорт продолжается с первой незагруженной пачки."""
+        records = [
+            {'text': f'Текст {number}', 'author': 'author'}
+            for number in range(5)
+        ]
+        records[3]['author'] = 'nobody'
+        path = self.write_jsonl('posts.jsonl', records)
+        with self.assertRaisesMessage(CommandError, 'Запись 4'):
+            self.call('import_data', path, 'post', batch_size=2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(ImportProgress.objects.get().records, 2)
+
+        records[3]['author'] = 'author'
+        self.write_jsonl('posts.jsonl', records)
+        output = self.call('import_data', path, 'post', batch_size=2)
+        self.assertIn('Загружено записей: 5', output)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Текст {number}' for number in range(5)],
+        )
+        self.assertFalse(ImportProgress.objects.exists())
+
+    def test_round_trip(self):
+        """Выгруженные файлы загружаются обратно без потерь."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Текст',
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        for model, name in (
+            ('group', 'groups.csv'), ('post', 'posts.jsonl'),
+            ('comment', 'comments.csv'),
+        ):
+            output = self.call('export_data', self.path(name), model)
+            self.assertIn('Выгружено записей: 1', output)
+        expected = list(Post.objects.values_list(
+            'pk', 'text', 'pub_date', 'author', 'group__slug',
+        ))
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+
+        self.call('import_data', self.path('groups.csv'), 'group')
+        self.call('import_data', self.path('posts.jsonl'), 'post')
+        self.call('import_data', self.path('comments.csv'), 'comment')
+        self.assertEqual(list(Post.objects.values_list(
+            'pk', 'text', 'pub_date', 'author', 'group__slug',
+        )), expected)
+        post = Post.objects.get()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author, self.reader)
+
+    def test_invalid_record(self):
+        """Запись с неверными полями не загружается."""
+        path = self.write_jsonl('comments.jsonl', [
+            {'post': '1', 'author': 'author'},
+        ])
+        with self.assertRaisesMessage(CommandError, 'нет полей text'):
+            self.call('import_data', path, 'comment')
+        with self.assertRaisesMessage(CommandError, 'Неизвестный формат'):
+            self.call('import_data', self.path('data.xml'), 'comment')
+
+    def test_malformed_file(self):
+        """Неразборчивая строка и неверный размер пачки - ошибки команды."""
+        path = self.path('groups.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"slug": "first", "title": "Первая"}\n{"slug": \n')
+        with self.assertRaisesMessage(CommandError, 'Запись 2:'):
+            self.call('import_data', path, 'group')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('["slug", "title"]\n')
+        with self.assertRaisesMessage(CommandError, 'ожидается объект JSON'):
+            self.call('import_data', path, 'group', restart=True)
+        with self.assertRaisesMessage(CommandError, 'не меньше 1'):
+            self.call('import_data', path, 'group', batch_size=0)
+        with self.assertRaisesMessage(CommandError, 'не меньше 1'):
+            self.call('export_data', path, 'group', batch_size=0)
+
+    def test_duplicate_records(self):
+        """Записи, которые уже есть в базе, не загружаются."""
+        path = self.write_jsonl('groups.jsonl', [
+            {'slug': 'new', 'title': 'Новая', 'description': 'Новая'},
+            {'slug': 'group', 'title': 'Повтор', 'description': 'Повтор'},
+        ])
+        with self.assertRaisesMessage(CommandError, 'Записи 1-2'):
+            self.call('import_data', path, 'group', batch_size=2)
+        self.assertFalse(Group.objects.filter(slug='new').exists())
+        self.call('export_data', self.path('export.jsonl'), 'group')
+        with self.assertRaisesMessage(CommandError, 'Записи 1-1'):
+            self.call('import_data', self.path('export.jsonl'), 'group')
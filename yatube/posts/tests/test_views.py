@@ -1,15 +1,22 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.templatetags.static import static
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post
+from posts import thumbnails, timeline
+from posts.models import Comment, Follow, Group, Like, Post, TimelineEntry
+from posts.stats import get_stats
 from posts.views import POSTS_MAX
 
 User = get_user_model()
@@ -233,6 +240,46 @@ class PostsViewTests(TestCase):
                     f'на странице {view}?page=2',
                 )
 
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_cursor_pagination(self):
+        """Проверка курсорной паджинации вперед и назад."""
+        test_views = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.test_user,)),
+        )
+        for view in test_views:
+            with self.subTest(view=view):
+                first_page = self.authorized_client.get(view).context[
+                    'page_obj'
+                ]
+                self.assertEqual(len(first_page), POSTS_MAX)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.authorized_client.get(
+                    view, {'cursor': first_page.next_cursor},
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page), TEST_POSTS_QTY - POSTS_MAX,
+                    f'Неверное количество постов на второй странице {view}',
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(set(first_page) & set(second_page))
+                back_page = self.authorized_client.get(
+                    view, {'cursor': second_page.previous_cursor},
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+                self.assertFalse(back_page.has_previous())
+
+    def test_invalid_cursor(self):
+        """Неверный курсор приводит к первой странице."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'garbage'},
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(Post.objects.order_by('-pub_date', '-id')[:POSTS_MAX]),
+        )
+
     def test_new_post_availability(self):
         """Проверка отображения на разных страницах созданного поста."""
         new_post = Post.objects.create(
@@ -292,19 +339,50 @@ class PostsViewTests(TestCase):
         """Проверка кэшированя главной страницы."""
         post = Post.objects.create(author=self.test_user, text='Тест Кэша')
         self.client.get(reverse('posts:index'))
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Изменено в обход')
         response_second = self.client.get(reverse('posts:index'))
         self.assertIn(
             post.text.encode(),
             response_second.content,
-            'Удаленная запись не отобразилась на кешированной странице.'
+            'Главная страница не была взята из кэша.'
         )
         cache.clear()
         response_third = self.client.get(reverse('posts:index'))
         self.assertNotIn(
             post.text.encode(),
             response_third.content,
-            'Удаленная запись отобразилась на странице после очистки кэша.'
+            'Устаревшая запись отобразилась на странице после очистки кэша.'
+        )
+
+    def test_cache_invalidation(self):
+        """Проверка сброса кэша лент после записи."""
+        post = Post.objects.create(
+            author=self.test_user, text='Тест Кэша', group=self.group,
+        )
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.test_user.username,)),
+        )
+        for page in pages:
+            self.client.get(page)
+        post.delete()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.client.get(page)
+                self.assertNotIn(
+                    post.text.encode(), response.content,
+                    f'Удаленная запись отобразилась на странице {page}.',
+                )
+
+    def test_follow_cache_per_user(self):
+        """Кэш ленты подписок не разделяется между пользователями."""
+        Follow.objects.create(user=self.subscribed_user, author=self.test_user)
+        self.subscribed_client.get(reverse('posts:follow_index'))
+        response = self.other_client.get(reverse('posts:follow_index'))
+        self.assertNotIn(
+            self.post.text.encode(), response.content,
+            'Чужая лента подписок отдана из кэша.',
         )
 
     def test_author_following(self):
@@ -367,6 +445,109 @@ class PostsViewTests(TestCase):
             'На странице не подписанного пользователя есть публикации.'
         )
 
+    def test_follow_timeline(self):
+        """Проверка наполнения и очистки ленты подписок."""
+        self.subscribed_client.get(
+            reverse('posts:profile_follow', args=(self.other_user.username,))
+        )
+        new_post = Post.objects.create(
+            author=self.other_user, text='Пост для подписчиков',
+        )
+        response = self.subscribed_client.get(reverse('posts:follow_index'))
+        self.assertIn(
+            new_post, response.context['page_obj'],
+            'Новый пост не попал в ленту подписчика.',
+        )
+        self.subscribed_client.get(
+            reverse('posts:profile_unfollow', args=(self.other_user.username,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.subscribed_user).exists(),
+            'Лента не очистилась после отписки.',
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_follow_timeline_heavy_author(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.subscribed_user, author=self.test_user)
+        cache.clear()
+        new_post = Post.objects.create(author=self.test_user, text='Новый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists(),
+            'Пост популярного автора разложен по лентам.',
+        )
+        response = self.subscribed_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            self.test_user.posts.count(),
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_follow_timeline_author_crosses_limit(self):
+        """Посты, вышедшие пока автор был популярным, не теряются."""
+        heavy_ids = timeline.heavy_author_ids()
+        self.assertNotIn(self.test_user.pk, heavy_ids)
+        Follow.objects.create(user=self.subscribed_user, author=self.test_user)
+        Follow.objects.create(user=self.other_user, author=self.test_user)
+        self.assertIn(self.test_user.pk, timeline.heavy_author_ids())
+        heavy_post = Post.objects.create(author=self.test_user, text='Тяжелый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=heavy_post).exists(),
+        )
+        with mock.patch('posts.timeline.tasks.submit') as submit:
+            Follow.objects.filter(
+                user=self.other_user, author=self.test_user,
+            ).delete()
+        submit.assert_called_once_with(timeline.refill, self.test_user.pk)
+        timeline.refill(self.test_user.pk)
+        self.assertNotIn(self.test_user.pk, timeline.heavy_author_ids())
+        response = self.subscribed_client.get(reverse('posts:follow_index'))
+        self.assertIn(heavy_post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=3)
+    def test_follow_timeline_author_jumps_limit(self):
+        """Порог учитывается, даже если подписки его перескочили."""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)
+        ]
+        Follow.objects.create(user=readers[0], author=self.test_user)
+        self.assertNotIn(self.test_user.pk, timeline.heavy_author_ids())
+        # bulk_create не отправляет сигналы: число подписчиков
+        # проходит порог, минуя его точное значение.
+        Follow.objects.bulk_create([
+            Follow(user=reader, author=self.test_user)
+            for reader in readers[1:]
+        ])
+        timeline.followers_changed(self.test_user.pk, followed=True)
+        self.assertIn(self.test_user.pk, timeline.heavy_author_ids())
+        with mock.patch('posts.timeline.tasks.submit') as submit:
+            Follow.objects.filter(
+                user__in=readers[1:], author=self.test_user,
+            ).delete()
+        submit.assert_called_with(timeline.refill, self.test_user.pk)
+
+    def test_author_stats(self):
+        """Статистика авторов обновляется при записи и читается из кэша."""
+        posts_count = get_stats(self.test_user.pk)['posts_count']
+        self.subscribed_client.get(
+            reverse('posts:profile_follow', args=(self.test_user.username,))
+        )
+        Post.objects.create(author=self.test_user, text='Еще пост')
+        with self.assertNumQueries(0):
+            author_stats = get_stats(self.test_user.pk)
+            reader_stats = get_stats(self.subscribed_user.pk)
+        self.assertEqual(author_stats['posts_count'], posts_count + 1)
+        self.assertEqual(author_stats['followers_count'], 1)
+        self.assertEqual(reader_stats['following_count'], 1)
+        self.subscribed_client.get(
+            reverse('posts:profile_unfollow', args=(self.test_user.username,))
+        )
+        self.assertEqual(get_stats(self.test_user.pk)['followers_count'], 0)
+        self.assertEqual(
+            get_stats(self.subscribed_user.pk)['following_count'], 0,
+        )
+
     def test_auth_user_comment(self):
         """Проверка того что авторизованный пользователь
         может оставлять комментарии."""
@@ -376,7 +557,7 @@ class PostsViewTests(TestCase):
             follow=True,
         )
         self.compare_obj_content(
-            response.context['comments'].first(),
+            response.context['comments'][0],
             Comment.objects.filter(author=self.test_user).first(),
         )
 
@@ -399,3 +580,148 @@ class PostsViewTests(TestCase):
             db_count, db_count_after,
             'Гостю удалось откомментировать публикацию.',
         )
+
+    def test_post_counters(self):
+        """Проверка денормализованных счетчиков комментариев и лайков."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Тестовый комментарий'},
+        )
+        self.other_client.post(
+            reverse('posts:like_post', args=(self.post.id,))
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.post.likes_count, 1)
+        self.other_client.post(
+            reverse('posts:like_post', args=(self.post.id,))
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(
+            self.post.likes_count, 0,
+            'Счетчик лайков не уменьшился после снятия лайка.',
+        )
+        Comment.objects.create(
+            post=self.post, author=self.other_user, text='Комментарий',
+        )
+        Like.objects.create(post=self.post, user=self.other_user)
+        User.objects.filter(pk=self.other_user.pk).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.comments_count, self.post.likes_count), (1, 0),
+            'Счетчики не обновились при каскадном удалении.',
+        )
+
+    def test_like_toggle(self):
+        """Переключение лайка отвечает новым состоянием в JSON."""
+        url = reverse('posts:like_post', args=(self.post.id,))
+        self.assertEqual(
+            self.other_client.post(url).json(),
+            {'liked': True, 'likes_count': 1},
+        )
+        self.assertEqual(
+            self.other_client.post(url).json(),
+            {'liked': False, 'likes_count': 0},
+        )
+        Like.objects.create(post=self.post, user=self.other_user)
+        with self.assertRaises(IntegrityError):
+            Like.objects.create(post=self.post, user=self.other_user)
+
+    def test_like_state_in_feeds(self):
+        """Ленты отмечают посты, лайкнутые текущим пользователем."""
+        Like.objects.create(post=self.post, user=self.other_user)
+        Follow.objects.create(user=self.other_user, author=self.test_user)
+        test_views = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.test_user.username,)),
+            reverse('posts:follow_index'),
+        )
+        for view in test_views:
+            with self.subTest(view=view):
+                page = self.other_client.get(view).context['page_obj']
+                liked = {post.pk for post in page if post.is_liked_by_me}
+                self.assertEqual(liked, {self.post.pk})
+        page = self.client.get(reverse('posts:index')).context['page_obj']
+        self.assertFalse(any(post.is_liked_by_me for post in page))
+
+    def test_recount_counters(self):
+        """Проверка команды пересчета счетчиков публикаций."""
+        Post.objects.filter(pk=self.post.pk).update(
+            comments_count=100, likes_count=100,
+        )
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.other_user, text='Текст'),
+        ])
+        call_command('recount_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.comments_count, self.post.likes_count), (1, 0),
+            'Команда recount_counters неверно пересчитала счетчики.',
+        )
+        self.assertEqual(
+            get_stats(self.test_user.pk)['posts_count'], TEST_POSTS_QTY,
+            'Команда recount_counters неверно пересчитала статистику.',
+        )
+
+    def test_thumbnails_pregenerated(self):
+        """До построения миниатюры в ленте показывается заглушка."""
+        placeholder = static('img/placeholder.svg')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, placeholder)
+        self.assertIsNone(thumbnails.post_image(self.post))
+        thumbnails.generate(self.post.pk)
+        image = thumbnails.post_image(self.post)
+        self.assertIsNotNone(image, 'Миниатюры не построены.')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, image['src'])
+        variant = self.post.image_variants.get(format='webp')
+        self.assertContains(
+            response, f'{variant.image.url} {variant.width}w',
+            msg_prefix='В ленте нет srcset с вариантами картинки.',
+        )
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_generate_thumbnails_command(self):
+        """Команда строит только недостающие миниатюры, с --force - все."""
+        thumbnails.generate(self.post.pk)
+        posts_with_images = Post.objects.exclude(image='').count()
+        out = StringIO()
+        with mock.patch('posts.thumbnails.generate') as generate:
+            call_command('generate_thumbnails', stdout=out)
+            self.assertNotIn(
+                self.post.pk, [args[0] for args, _ in generate.call_args_list],
+            )
+            self.assertEqual(generate.call_count, posts_with_images - 1)
+            generate.reset_mock()
+            call_command('generate_thumbnails', force=True, stdout=out)
+            self.assertEqual(generate.call_count, posts_with_images)
+
+    def test_thumbnails_scheduled(self):
+        """Сохранение картинки ставит построение миниатюр в очередь."""
+        uploaded = SimpleUploadedFile(
+            name='scheduled.gif',
+            content=self.post.image.read(),
+            content_type='image/gif',
+        )
+        with mock.patch('posts.thumbnails.tasks.submit') as submit:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': uploaded},
+            )
+            post = Post.objects.get(text='С картинкой')
+            # Кроме миниатюр, в очередь ставится пересборка лент.
+            self.assertEqual(
+                [c for c in submit.call_args_list
+                 if c[0][0] is thumbnails.generate],
+                [mock.call(thumbnails.generate, post.pk)],
+            )
+            submit.reset_mock()
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=(post.pk,)),
+                data={'text': 'Без новой картинки'},
+            )
+            self.assertNotIn(
+                thumbnails.generate,
+                [args[0] for args, _ in submit.call_args_list],
+            )
@@ -0,0 +1,158 @@
+"""Миниатюры картинок публикаций, подготовленные заранее.
+
+Сразу после сохранения картинки фоновая задача строит ее варианты
+нескольких ширин, вписанные в рамку карточки: в WebP и AVIF (если
+Pillow умеет его сохранять) и в JPEG или PNG для старых браузеров.
+Шаблоны отдают их через srcset, и браузер выбирает самый легкий
+подходящий. Пока вариантов нет, показывается заглушка: Pillow
+в обработке запроса не участвует.
+
+Варианты хранятся в ImageVariant и загружаются вместе с лентой через
+prefetch_related, поэтому картинки страницы не требуют отдельных
+запросов к базе.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from core import tasks
+from posts import caching
+from posts.models import ImageVariant, Post
+
+VARIANT_BOX = (960, 339)
+VARIANT_WIDTHS = (480, 960, 1440)
+VARIANT_QUALITY = {'AVIF': 50, 'WEBP': 75, 'JPEG': 85, 'PNG': None}
+FALLBACK_FORMATS = ('jpeg', 'png')
+VARIANT_SIZES = '(max-width: 576px) 100vw, 960px'
+
+
+def variant_formats(transparent=False):
+    """Форматы вариантов, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    fallback = 'PNG' if transparent else 'JPEG'
+    return [
+        fmt for fmt in ('AVIF', 'WEBP', fallback) if fmt in Image.SAVE
+    ]
+
+
+def generate(post_id):
+    """Строит все варианты картинки публикации."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id',
+    ).first()
+    if post is None or not post.image:
+        return
+    build_variants(post)
+    # В кэше лент сохранена заглушка, ленты нужно пересобрать.
+    caching.bump(*caching.post_scopes(post.author_id, post.group_id, post.pk))
+
+
+def resized(image, width):
+    """Вписывает картинку в рамку карточки шириной width."""
+    box_width, box_height = VARIANT_BOX
+    height = round(width * box_height / box_width)
+    scale = min(width / image.width, height / image.height)
+    size = (
+        max(1, round(image.width * scale)),
+        max(1, round(image.height * scale)),
+    )
+    return image.resize(size, Image.LANCZOS), scale
+
+
+def encode(image, fmt):
+    """Сохраняет картинку в формате fmt и возвращает ее байты."""
+    buffer = BytesIO()
+    quality = VARIANT_QUALITY[fmt]
+    if fmt == 'JPEG':
+        image.convert('RGB').save(
+            buffer, fmt, quality=quality, optimize=True, progressive=True,
+        )
+    elif quality is None:
+        image.save(buffer, fmt, optimize=True)
+    else:
+        image.save(buffer, fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def build_variants(post):
+    """Пересобирает варианты картинки публикации во всех форматах."""
+    for variant in post.image_variants.all():
+        variant.image.delete(save=False)
+    post.image_variants.all().delete()
+
+    with post.image.open('rb') as image_file:
+        source = Image.open(image_file)
+        source.load()
+        source_size = post.image.size
+    source = ImageOps.exif_transpose(source)
+    transparent = 'A' in source.getbands() or 'transparency' in source.info
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if transparent else 'RGB')
+
+    name = os.path.splitext(os.path.basename(post.image.name))[0]
+    variants = []
+    for width in VARIANT_WIDTHS:
+        image, scale = resized(source, width)
+        # Увеличенные копии не нужны: хватит одной, для маленьких картинок.
+        if scale > 1 and variants:
+            break
+        for fmt in variant_formats(transparent):
+            content = encode(image, fmt)
+            extension = 'jpg' if fmt == 'JPEG' else fmt.lower()
+            variant = ImageVariant(
+                post=post, format=fmt.lower(),
+                width=image.width, height=image.height,
+                size=len(content), source_size=source_size,
+            )
+            variant.image.save(
+                f'{name}_{image.width}.{extension}',
+                ContentFile(content), save=False,
+            )
+            variants.append(variant)
+    ImageVariant.objects.bulk_create(variants)
+
+
+def srcset(variants):
+    return ', '.join(f'{v.image.url} {v.width}w' for v in variants)
+
+
+def post_image(post):
+    """Готовые варианты картинки публикации для тегов picture и img.
+
+    Возвращает None, пока варианты не построены. Варианты берутся
+    из post.image_variants, поэтому в лентах их следует загружать
+    через prefetch_related. Сортировка выполняется здесь, чтобы запрос
+    вариантов обходился индексом по публикации.
+    """
+    by_format = {}
+    variants = sorted(post.image_variants.all(), key=lambda v: v.width)
+    for variant in variants:
+        by_format.setdefault(variant.format, []).append(variant)
+    fallback = next(
+        (by_format[fmt] for fmt in FALLBACK_FORMATS if fmt in by_format),
+        None,
+    )
+    if fallback is None:
+        return None
+    # Для браузеров без srcset берем вариант под ширину карточки.
+    src = max(
+        (v for v in fallback if v.width <= VARIANT_BOX[0]),
+        key=lambda v: v.width, default=fallback[0],
+    )
+    return {
+        'src': src.image.url,
+        'srcset': srcset(fallback),
+        'sizes': VARIANT_SIZES,
+        'sources': [
+            {'type': f'image/{fmt}', 'srcset': srcset(by_format[fmt])}
+            for fmt in ('avif', 'webp') if fmt in by_format
+        ],
+    }
+
+
+def schedule(post):
+    """Ставит построение вариантов картинки в фоновую очередь."""
+    if post.image:
+        tasks.submit(generate, post.pk)
@@ -0,0 +1,166 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации поста запись о нем раскладывается в ленты всех
+подписчиков автора, поэтому follow_index читает один диапазон индекса
+вместо соединения через подписки. Для авторов с очень большим числом
+подписчиков раскладка не выполняется: их посты подмешиваются
+в ленту при чтении (fan-out on read).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+
+from core import tasks
+from posts.models import Follow, Post, TimelineEntry
+
+BATCH_SIZE: int = 500
+
+
+def fanout_limit():
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def heavy_authors_key():
+    return f'timeline:heavy_authors:{fanout_limit()}'
+
+
+def heavy_author_ids():
+    """Авторы, чьи посты не раскладываются по лентам подписчиков."""
+    key = heavy_authors_key()
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = frozenset(
+            Follow.objects.order_by().values('author')
+            .annotate(followers=Count('pk'))
+            .filter(followers__gte=fanout_limit())
+            .values_list('author', flat=True)
+        )
+        cache.set(key, author_ids, settings.TIMELINE_HEAVY_AUTHORS_TIMEOUT)
+    return author_ids
+
+
+def make_entries(user_ids, posts):
+    return [
+        TimelineEntry(
+            user_id=user_id, post_id=post.pk,
+            author_id=post.author_id, pub_date=post.pub_date,
+        )
+        for user_id in user_ids for post in posts
+    ]
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков его автора."""
+    if post.author_id in heavy_author_ids():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user', flat=True)
+    TimelineEntry.objects.bulk_create(
+        make_entries(follower_ids, [post]),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними постами автора после подписки."""
+    if author_id in heavy_author_ids():
+        return
+    posts = Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date',
+    )[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        make_entries([user_id], posts),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def followers_changed(author_id, followed):
+    """Следит за переходом автора через TIMELINE_FANOUT_LIMIT.
+
+    Ставший тяжелым автор сразу исключается из кэша тяжелых, чтобы его
+    посты подмешивались при чтении. Переставшему быть тяжелым
+    в фоне раскладываются посты, не попавшие в ленты, пока его посты
+    читались при чтении.
+
+    Подписки, добавленные пачкой или одновременно, могут перескочить
+    порог, поэтому новое число подписчиков сравнивается не с самим
+    порогом, а с тем, считается ли автор тяжелым в кэше; без кэша -
+    с числом подписчиков до изменения.
+    """
+    followers = Follow.objects.filter(author_id=author_id).count()
+    previous = followers - 1 if followed else followers + 1
+    limit = fanout_limit()
+    heavy_ids = cache.get(heavy_authors_key())
+    if heavy_ids is None:
+        was_heavy = previous >= limit
+    else:
+        was_heavy = author_id in heavy_ids
+    if followed and followers >= limit and not was_heavy:
+        cache.delete(heavy_authors_key())
+    elif not followed and followers < limit and was_heavy:
+        tasks.submit(refill, author_id)
+
+
+def refill(author_id):
+    """Заполняет ленты всех подписчиков последними постами автора.
+
+    Кэш тяжелых авторов сбрасывается после заполнения: до этого посты
+    автора еще подмешиваются при чтении.
+    """
+    posts = list(Post.objects.filter(author_id=author_id).only(
+        'pk', 'author_id', 'pub_date',
+    )[:settings.TIMELINE_BACKFILL])
+    follower_ids = Follow.objects.filter(
+        author_id=author_id,
+    ).values_list('user', flat=True)
+    for user_id in follower_ids.iterator():
+        TimelineEntry.objects.bulk_create(
+            make_entries([user_id], posts),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+    cache.delete(heavy_authors_key())
+
+
+def prune(user_id, author_id):
+    """Удаляет из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Собирает ленту пользователя заново по его текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(user_id=user_id).values_list(
+        'author', flat=True,
+    )
+    for author_id in author_ids:
+        backfill(user_id, author_id)
+
+
+def timeline_posts(user):
+    """Публикации ленты подписок пользователя.
+
+    Лента сортируется по полям feed_date и feed_post. В обычном случае
+    это поля записей ленты, и выборка страницы - один проход по индексу
+    (user, -pub_date, -post) без сортировки во временном B-дереве.
+    """
+    heavy_ids = heavy_author_ids()
+    if heavy_ids:
+        pulled_ids = list(
+            Follow.objects.filter(
+                user=user, author__in=heavy_ids,
+            ).values_list('author', flat=True)
+        )
+        if pulled_ids:
+            in_timeline = Q(
+                pk__in=TimelineEntry.objects.filter(user=user).values('post')
+            )
+            return Post.objects.filter(
+                in_timeline | Q(author__in=pulled_ids),
+            ).annotate(
+                feed_date=F('pub_date'), feed_post=F('id'),
+            ).order_by('-feed_date', '-feed_post')
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    ).order_by('-feed_date', '-feed_post')
@@ -0,0 +1,481 @@
+"""Массовый импорт и экспорт групп, публикаций и комментариев.
+
+Файлы в формате CSV или JSON Lines читаются и пишутся построчно, поэтому
+память не зависит от размера файла. Импорт вставляет записи пачками
+по batch_size через bulk_create; каждая пачка - отдельная транзакция,
+в которой обновляется и ImportProgress. После сбоя повторный запуск
+пропускает уже загруженные записи и продолжает со следующей пачки.
+
+bulk_create не отправляет сигналы, поэтому поисковый индекс, ленты
+подписок, счетчики и статистика авторов обновляются для каждой пачки
+в той же транзакции, а области кэша инвалидируются и миниатюры картинок
+ставятся в очередь после фиксации.
+
+Экспорт читает таблицу через iterator() кусками по batch_size.
+"""
+import abc
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import caching, feeds, search, stats, thumbnails, timeline
+from posts.management.commands.recount_counters import recount_counters
+from posts.models import (
+    Comment, Follow, Group, ImportProgress, Post, TimelineEntry,
+)
+
+BATCH_SIZE: int = 1000
+FORMATS = ('csv', 'jsonl')
+
+User = get_user_model()
+
+
+class TransferError(ValueError):
+    """Ошибка в данных файла импорта."""
+
+
+def detect_format(path, fmt=None):
+    """Формат из параметра или из расширения файла."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt == 'json':
+        fmt = 'jsonl'
+    if fmt not in FORMATS:
+        raise TransferError(
+            f'Неизвестный формат {fmt!r}, ожидается {" или ".join(FORMATS)}.'
+        )
+    return fmt
+
+
+def check_batch_size(batch_size):
+    if batch_size < 1:
+        raise TransferError('Размер пачки должен быть не меньше 1.')
+
+
+def read_records(file, fmt):
+    """Записи файла по одной: словари CSV или строки JSON Lines.
+
+    Строки JSON разбирает parse_record(), чтобы ошибка в строке
+    получила номер записи.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield line
+
+
+def parse_record(record, fmt):
+    if fmt == 'csv':
+        return record
+    record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError('ожидается объект JSON')
+    return record
+
+
+def plain(record):
+    """Даты в ISO 8601 с микросекундами: DjangoJSONEncoder их обрезает."""
+    return {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in record.items()
+    }
+
+
+class RecordWriter:
+    """Построчная запись словарей в CSV или JSON Lines."""
+
+    def __init__(self, file, fmt, fields):
+        self.file = file
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(file, fieldnames=fields)
+            self.csv.writeheader()
+
+    def write(self, record):
+        record = plain(record)
+        if self.fmt == 'csv':
+            self.csv.writerow({
+                name: '' if value is None else value
+                for name, value in record.items()
+            })
+        else:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def optional(value):
+    """Пустая строка CSV означает отсутствие значения."""
+    return None if value in ('', None) else value
+
+
+def date_value(value):
+    value = optional(value)
+    if value is None:
+        return timezone.now()
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError(f'неверная дата {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def lookup(model, field, values):
+    """Словарь {значение поля: pk} одним запросом."""
+    return dict(
+        model.objects.filter(**{f'{field}__in': set(values)})
+        .values_list(field, 'pk')
+    )
+
+
+class Transfer(abc.ABC):
+    """Описание импорта и экспорта одной модели."""
+
+    model = None
+    fields = ()
+    required = ()
+    date_field = None
+
+    @abc.abstractmethod
+    def export_rows(self):
+        """Значения полей в порядке fields, по возрастанию pk."""
+
+    def prepare(self, records):
+        """Данные, общие для пачки: связанные объекты одним запросом."""
+        return {}
+
+    @abc.abstractmethod
+    def build(self, record, context):
+        """Несохраненный объект модели из записи файла."""
+
+    def after_insert(self, objects, context):
+        """Обновляет производные данные. Возвращает области кэша."""
+        return set()
+
+    def make(self, record, context):
+        missing = [
+            name for name in self.required
+            if optional(record.get(name)) is None
+        ]
+        if missing:
+            raise ValueError(f'нет полей {", ".join(missing)}')
+        obj = self.build(record, context)
+        if optional(record.get('id')) is not None:
+            obj.pk = int(record['id'])
+        obj.clean_fields(exclude=['author', 'post', 'group', 'image'])
+        return obj
+
+    def insert(self, objects):
+        """bulk_create с восстановлением pk там, где база их не вернула.
+
+        SQLite не возвращает ключи вставленных строк. Пачка вставляется
+        одной командой, пока транзакция держит блокировку записи, поэтому
+        новые автоматические ключи - это ключи больше прежнего максимума,
+        по порядку вставки.
+
+        bulk_create ставит полю с auto_now_add текущее время, поэтому
+        даты из файла записываются следом одним bulk_update.
+        """
+        model = self.model
+        dates = []
+        if self.date_field:
+            dates = [getattr(obj, self.date_field) for obj in objects]
+        before = model.objects.order_by('-pk').values_list(
+            'pk', flat=True,
+        ).first() or 0
+        explicit = {obj.pk for obj in objects if obj.pk is not None}
+        created = model.objects.bulk_create(objects)
+        missing = [obj for obj in created if obj.pk is None]
+        if missing:
+            new_pks = [
+                pk for pk in model.objects.filter(pk__gt=before)
+                .order_by('pk').values_list('pk', flat=True)
+                if pk not in explicit
+            ]
+            for obj, pk in zip(missing, new_pks):
+                obj.pk = pk
+        if dates:
+            for obj, date in zip(created, dates):
+                setattr(obj, self.date_field, date)
+            model.objects.bulk_update(created, [self.date_field])
+        return created
+
+
+class GroupTransfer(Transfer):
+    model = Group
+    fields = ('id', 'slug', 'title', 'description')
+    required = ('slug', 'title')
+
+    def export_rows(self):
+        return Group.objects.order_by('pk').values_list(*self.fields)
+
+    def build(self, record, context):
+        return Group(
+            slug=record['slug'], title=record['title'],
+            description=record.get('description') or '',
+        )
+
+
+class PostTransfer(Transfer):
+    model = Post
+    fields = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+    required = ('text', 'author')
+    date_field = 'pub_date'
+
+    def export_rows(self):
+        return Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'pub_date', 'author__username', 'group__slug',
+            'image',
+        )
+
+    def prepare(self, records):
+        return {
+            'authors': lookup(
+                User, 'username', [record.get('author') for record in records],
+            ),
+            'groups': lookup(Group, 'slug', [
+                optional(record.get('group')) for record in records
+            ]),
+        }
+
+    def build(self, record, context):
+        author_id = context['authors'].get(record['author'])
+        if author_id is None:
+            raise ValueError(f'нет пользователя {record["author"]!r}')
+        slug = optional(record.get('group'))
+        group_id = None
+        if slug is not None:
+            group_id = context['groups'].get(slug)
+            if group_id is None:
+                raise ValueError(f'нет группы {slug!r}')
+        return Post(
+            text=record['text'], author_id=author_id, group_id=group_id,
+            pub_date=date_value(record.get('pub_date')),
+            image=optional(record.get('image')) or '',
+        )
+
+    def after_insert(self, posts, context):
+        post_ids = [post.pk for post in posts]
+        search.rebuild(Post.objects.filter(pk__in=post_ids))
+        by_author = defaultdict(list)
+        for post in posts:
+            by_author[post.author_id].append(post)
+        heavy_ids = timeline.heavy_author_ids()
+        followers = defaultdict(list)
+        for user_id, author_id in Follow.objects.filter(
+            author_id__in=[
+                author_id for author_id in by_author
+                if author_id not in heavy_ids
+            ],
+        ).values_list('user', 'author'):
+            followers[author_id].append(user_id)
+        for author_id, user_ids in followers.items():
+            TimelineEntry.objects.bulk_create(
+                timeline.make_entries(user_ids, by_author[author_id]),
+                batch_size=timeline.BATCH_SIZE, ignore_conflicts=True,
+            )
+        stats.recount(User.objects.filter(pk__in=by_author))
+        scopes = {caching.stats_scope(author_id) for author_id in by_author}
+        feed_scopes = set()
+        for post in posts:
+            scopes.update(
+                caching.post_scopes(post.author_id, post.group_id, post.pk),
+            )
+            feed_scopes.update(
+                caching.post_scopes(post.author_id, post.group_id),
+            )
+        feeds.changed(*feed_scopes)
+        for post in posts:
+            thumbnails.schedule(post)
+        return scopes
+
+
+class CommentTransfer(Transfer):
+    model = Comment
+    fields = ('id', 'post', 'author', 'text', 'created')
+    required = ('post', 'author', 'text')
+    date_field = 'created'
+
+    def export_rows(self):
+        return Comment.objects.order_by('pk').values_list(
+            'pk', 'post_id', 'author__username', 'text', 'created',
+        )
+
+    def prepare(self, records):
+        post_ids = set()
+        for record in records:
+            try:
+                post_ids.add(int(record.get('post')))
+            except (TypeError, ValueError):
+                pass
+        return {
+            'authors': lookup(
+                User, 'username', [record.get('author') for record in records],
+            ),
+            'posts': {
+                fields['pk']: fields for fields in Post.objects.filter(
+                    pk__in=post_ids,
+                ).values('pk', 'author_id', 'group_id')
+            },
+        }
+
+    def build(self, record, context):
+        author_id = context['authors'].get(record['author'])
+        if author_id is None:
+            raise ValueError(f'нет пользователя {record["author"]!r}')
+        post_id = int(record['post'])
+        if post_id not in context['posts']:
+            raise ValueError(f'нет публикации {post_id}')
+        return Comment(
+            text=record['text'], author_id=author_id, post_id=post_id,
+            created=date_value(record.get('created')),
+        )
+
+    def after_insert(self, comments, context):
+        post_ids = {comment.post_id for comment in comments}
+        recount_counters(Post.objects.filter(pk__in=post_ids))
+        scopes = set()
+        for post_id in post_ids:
+            fields = context['posts'][post_id]
+            scopes.update(caching.post_scopes(
+                fields['author_id'], fields['group_id'], post_id,
+            ))
+        return scopes
+
+
+TRANSFERS = {
+    'group': GroupTransfer,
+    'post': PostTransfer,
+    'comment': CommentTransfer,
+}
+
+
+def progress_source(model, path):
+    return f'{model}:{os.path.abspath(path)}'
+
+
+def import_records(model, path, fmt=None, batch_size=BATCH_SIZE,
+                   restart=False, report=None):
+    """Загружает файл в базу пачками. Возвращает (загружено, секунд).
+
+    report(loaded, rate) вызывается после каждой пачки. Загрузка
+    продолжается с записи, на которой остановился прошлый запуск,
+    если restart не задан; после успешного завершения отметка удаляется.
+    """
+    transfer = TRANSFERS[model]()
+    fmt = detect_format(path, fmt)
+    check_batch_size(batch_size)
+    source = progress_source(model, path)
+    if restart:
+        ImportProgress.objects.filter(source=source).delete()
+    progress, _ = ImportProgress.objects.get_or_create(source=source)
+    skip = progress.records
+    loaded = 0
+    started = time.monotonic()
+    with open(path, newline='', encoding='utf-8') as file:
+        records = read_records(file, fmt)
+        try:
+            # Уже загруженные записи читаются и отбрасываются.
+            for _ in zip(range(skip), records):
+                pass
+            for batch in batches(records, batch_size):
+                loaded += import_batch(
+                    transfer, fmt, batch, skip + loaded, progress,
+                )
+                if report is not None:
+                    report(skip + loaded, loaded / elapsed(started))
+        except (csv.Error, UnicodeDecodeError) as error:
+            raise TransferError(
+                f'Файл не читается после записи {skip + loaded}: {error}'
+            ) from error
+    progress.delete()
+    reset_sequence(transfer.model)
+    return skip + loaded, elapsed(started)
+
+
+def import_batch(transfer, fmt, batch, before, progress):
+    """Загружает пачку в одной транзакции. Возвращает число записей.
+
+    before - сколько записей файла загружено до пачки.
+    """
+    records = []
+    objects = []
+    for number, record in enumerate(batch, before + 1):
+        try:
+            records.append(parse_record(record, fmt))
+        except ValueError as error:
+            raise TransferError(f'Запись {number}: {error}') from error
+    context = transfer.prepare(records)
+    for number, record in enumerate(records, before + 1):
+        try:
+            objects.append(transfer.make(record, context))
+        except (ValidationError, ValueError, TypeError) as error:
+            raise TransferError(f'Запись {number}: {error}') from error
+    try:
+        with transaction.atomic():
+            created = transfer.insert(objects)
+            scopes = transfer.after_insert(created, context)
+            ImportProgress.objects.filter(pk=progress.pk).update(
+                records=before + len(batch), updated=timezone.now(),
+            )
+    except IntegrityError as error:
+        # Например, повторяющийся slug или id, которые уже есть в базе.
+        raise TransferError(
+            f'Записи {before + 1}-{before + len(batch)} не загружены: '
+            f'{error}'
+        ) from error
+    caching.bump(*scopes)
+    return len(batch)
+
+
+def reset_sequence(model):
+    """Сдвигает последовательность ключей за загруженные явно id.
+
+    Нужно на PostgreSQL: вставка с явным id не двигает
+    последовательность. Для SQLite команд нет.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def elapsed(started):
+    return max(time.monotonic() - started, 1e-6)
+
+
+def export_records(model, path, fmt=None, batch_size=BATCH_SIZE):
+    """Выгружает таблицу в файл. Возвращает (выгружено, секунд)."""
+    transfer = TRANSFERS[model]()
+    fmt = detect_format(path, fmt)
+    check_batch_size(batch_size)
+    started = time.monotonic()
+    exported = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = RecordWriter(file, fmt, transfer.fields)
+        for row in transfer.export_rows().iterator(chunk_size=batch_size):
+            writer.write(dict(zip(transfer.fields, row)))
+            exported += 1
+    return exported, elapsed(started)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -22,11 +22,42 @@ urlpatterns = [
         name='profile_unfollow',
     ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/', views.post_comments,
+        name='comments',
+    ),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('follow/', views.follow_index, name='follow_index'),
     path('create/', views.post_create, name='post_create'),
     path('account/<str:username>', views.user_account, name='user_account'),
+    path('account/archive/', views.archive_download, name='archive'),
+    path(
+        'account/archive/request/', views.archive_request,
+        name='archive_request',
+    ),
+    path('search/', views.search, name='search'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path(
+        'api/groups/<slug:slug>/posts/', api.group_posts,
+        name='api_group_posts',
+    ),
+    path(
+        'api/profiles/<str:username>/posts/', api.profile_posts,
+        name='api_profile_posts',
+    ),
+    path('api/follow/', api.follow_posts, name='api_follow'),
+    path('feeds/<str:fmt>/', feeds.index_feed, name='feed'),
+    path(
+        'feeds/group/<slug:slug>/<str:fmt>/', feeds.group_feed,
+        name='group_feed',
+    ),
+    path(
+        'feeds/profile/<str:username>/<str:fmt>/', feeds.author_feed,
+        name='profile_feed',
+    ),
     path('', views.index, name='index'),
 
 ]
@@ -1,9 +1,242 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_PARAM: str = 'cursor'
+NEXT: str = 'n'
+PREVIOUS: str = 'p'
+
+
+class FeedPaginator(Paginator):
+    """Постраничный паджинатор, считающий записи без аннотаций.
+
+    Аннотации лент (is_liked_by_me, поля сортировки ленты подписок)
+    нужны только для отображения; в COUNT(*) они превращаются в
+    подзапрос с GROUP BY по всей таблице.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query.chain()
+        query.annotations.clear()
+        query.set_annotation_mask(None)
+        query.clear_ordering(True)
+        return query.get_count(using=self.object_list.db)
+
+
+def estimated_count(model, using):
+    """Оценка числа строк таблицы без COUNT(*) или None.
+
+    PostgreSQL хранит оценку в статистике планировщика. В SQLite
+    наибольший rowid читается с конца B-дерева; удаленные строки
+    делают оценку завышенной.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {table}')
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор, оценивающий размер большой таблицы без фильтров.
+
+    Точный COUNT(*) по всей таблице читает ее целиком. Если оценка
+    больше ESTIMATED_COUNT_THRESHOLD, показывается она; с фильтрами
+    и поиском число строк считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate > settings.ESTIMATED_COUNT_THRESHOLD
+            ):
+                return estimate
+        return super().count
+
+
+class CursorPage(Sequence):
+    """Страница курсорной паджинации.
+
+    Повторяет интерфейс django.core.paginator.Page, который используют
+    шаблоны, но вместо номеров страниц хранит непрозрачные токены
+    следующей и предыдущей страниц.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, cursor, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Паджинатор по ключу сортировки (keyset pagination).
+
+    Вместо OFFSET и COUNT(*) выбирает строки, идущие после значений
+    ключа последней показанной записи, поэтому глубокие страницы
+    обходятся так же дешево, как первая. По умолчанию ключом служит
+    сортировка queryset; последнее поле ключа должно быть уникальным.
+    Поля ключа могут быть аннотациями queryset.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        if ordering is None:
+            ordering = (
+                object_list.query.order_by
+                or object_list.model._meta.ordering
+            )
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+
+    def ordering(self, backwards=False):
+        return [
+            f'-{name}' if descending != backwards else name
+            for name, descending in self.fields
+        ]
+
+    def field(self, name):
+        """Поле модели или выходное поле аннотации с именем name."""
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def encode(self, direction, obj):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode(self, cursor):
+        """Разбирает токен; при любой ошибке выбрасывает ValueError."""
+        try:
+            payload = base64.urlsafe_b64decode(cursor.encode())
+            direction, raw_values = json.loads(payload.decode())
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            if len(raw_values) != len(self.fields):
+                raise ValueError(raw_values)
+            values = [
+                self.field(name).to_python(raw)
+                for (name, _), raw in zip(self.fields, raw_values)
+            ]
+        except (
+            binascii.Error, TypeError, UnicodeError, ValidationError,
+        ) as error:
+            raise ValueError(cursor) from error
+        if None in values:
+            raise ValueError(cursor)
+        return direction, values
+
+    def keyset_filter(self, values, backwards=False):
+        """Условие «строго после ключа values» в порядке сортировки."""
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != backwards else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (prev_name, _) in enumerate(self.fields[:i]):
+                step &= Q(**{prev_name: values[j]})
+            condition |= step
+        return condition
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по токену; неверный токен - первая страница."""
+        direction, values = None, None
+        if cursor:
+            try:
+                direction, values = self.decode(cursor)
+            except ValueError:
+                cursor = None
+        backwards = direction == PREVIOUS
+        queryset = self.object_list.order_by(*self.ordering(backwards))
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, backwards))
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == NEXT
+
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode(NEXT, object_list[-1])
+        if object_list and has_previous:
+            previous_cursor = self.encode(PREVIOUS, object_list[0])
+
+        return CursorPage(object_list, cursor, next_cursor, previous_cursor)
+
+
+def paginate(request, post_list, post_per_page, cursor=None):
+    """Функция для разбития контента на страницы.
 
+    По умолчанию использует постраничный Paginator. Курсорный режим
+    включается настройкой CURSOR_PAGINATION, аргументом cursor=True
+    или наличием параметра cursor в запросе.
+    """
+    if cursor is None:
+        cursor = (
+            getattr(settings, 'CURSOR_PAGINATION', False)
+            or CURSOR_PARAM in request.GET
+        )
+    if cursor:
+        paginator = CursorPaginator(post_list, post_per_page)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
 
-def paginate(request, post_list, post_per_page):
-    """Функция для разбития контента на страницы."""
-    paginator = Paginator(post_list, post_per_page)
+    paginator = FeedPaginator(post_list, post_per_page)
     page_number = request.GET.get('page')
 
     return paginator.get_page(page_number)
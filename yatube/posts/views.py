@@ -1,46 +1,98 @@
+from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
-from django.http import HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 
-from posts.forms import CommentForm, PostForm
+from core.queries import query_budget
+from core.routers import use_primary
+from posts import archive, caching, likes, search as post_search
+from posts.forms import CommentForm, PostForm, SearchForm
 from posts.models import Follow, Group, Post, Like
-from posts.utils import paginate
+from posts.timeline import timeline_posts
+from posts.utils import CURSOR_PARAM, CursorPaginator, paginate
 
 
 POSTS_MAX: int = 10
+COMMENTS_MAX: int = 20
 
 User = get_user_model()
 
 
+@query_budget(6)
 def index(request):
     """Главная страница. Все публикации."""
-    post_list = Post.objects.select_related('author', 'group')
+    etag, modified = caching.validators(request, 'index', [caching.INDEX])
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    post_list = Post.objects.select_related(
+        'author', 'group',
+    ).with_engagement(request.user).prefetch_related('image_variants')
     page_obj = paginate(request, post_list, POSTS_MAX)
-    context = {'page_obj': page_obj}
+    context = {
+        'page_obj': page_obj,
+        'feed_version': caching.feed_version(
+            caching.INDEX, *caching.viewer_scopes(request.user),
+        ),
+    }
 
-    return render(request, 'posts/index.html', context)
+    response = render(request, 'posts/index.html', context)
 
+    return caching.with_validators(request, response, etag, modified)
 
+
+@query_budget(6)
 def group_list(request, slug):
     """Страница группы. Публикации выбранной группы."""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author', 'group')
+    etag, modified = caching.validators(
+        request, f'group:{group.pk}', [caching.group_scope(group.pk)],
+    )
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    post_list = group.posts.select_related(
+        'author', 'group',
+    ).with_engagement(request.user).prefetch_related('image_variants')
     page_obj = paginate(request, post_list, POSTS_MAX)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': caching.feed_version(
+            caching.group_scope(group.pk),
+            *caching.viewer_scopes(request.user),
+        ),
     }
 
-    return render(request, 'posts/group_list.html', context)
+    response = render(request, 'posts/group_list.html', context)
+
+    return caching.with_validators(request, response, etag, modified)
 
 
+@query_budget(8)
 def profile(request, username):
     """Страница профиля пользователя."""
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related('author', 'group')
+    etag, modified = caching.validators(
+        request, f'profile:{author.pk}',
+        [caching.author_scope(author.pk), caching.stats_scope(author.pk)],
+    )
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    post_list = author.posts.select_related(
+        'author', 'group',
+    ).with_engagement(request.user).prefetch_related('image_variants')
     page_obj = paginate(request, post_list, POSTS_MAX)
     following = (
         request.user.is_authenticated
@@ -50,34 +102,88 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'feed_version': caching.feed_version(
+            caching.author_scope(author.pk),
+            *caching.viewer_scopes(request.user),
+        ),
     }
 
-    return render(request, 'posts/profile.html', context)
+    response = render(request, 'posts/profile.html', context)
+
+    return caching.with_validators(request, response, etag, modified)
 
 
+@query_budget(6)
 def post_detail(request, post_id):
     """Страница отдельной взятой публикации."""
-    post = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
-        pk=post_id,
+    # Автор публикации не меняется и хранится в кэше без срока:
+    # по нему ETag проверяется до чтения публикации.
+    author_key = f'post:author:{post_id}'
+    author_id = cache.get(author_key)
+    post = None
+    if author_id is None:
+        post = detail_post(request, post_id)
+        author_id = post.author_id
+        cache.set(author_key, author_id, None)
+    etag, modified = caching.validators(
+        request, f'post:{post_id}',
+        [caching.post_scope(post_id), caching.stats_scope(author_id)],
     )
-    comments = post.comments.select_related('author')
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    if post is None:
+        post = detail_post(request, post_id)
+    likes.overlay([post], request.user)
+    comments = comments_page(request, post)
     form = CommentForm()
-    if request.user.is_authenticated:
-        liked = Like.objects.filter(user=request.user, post=post_id).exists()
-    else:
-        liked = False
 
     context = {
         'post': post,
         'form': form,
         'comments': comments,
-        'liked': liked,
     }
 
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+
+    return caching.with_validators(request, response, etag, modified)
+
+
+def detail_post(request, post_id):
+    return get_object_or_404(
+        Post.objects.select_related(
+            'author', 'group',
+        ).with_engagement(request.user),
+        pk=post_id,
+    )
+
+
+def comments_page(request, post):
+    """Страница комментариев публикации по курсору (created, id)."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), COMMENTS_MAX,
+    )
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
+
+
+@query_budget(4)
+def post_comments(request, post_id):
+    """Следующая страница комментариев - фрагмент для подгрузки."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    etag, modified = caching.validators(
+        request, f'comments:{post.pk}', [caching.post_scope(post.pk)],
+    )
+    response = caching.not_modified(request, etag, modified)
+    if response is not None:
+        return caching.with_validators(request, response, etag, modified)
+    context = {'post': post, 'comments': comments_page(request, post)}
+    response = render(request, 'posts/includes/comments_page.html', context)
 
+    return caching.with_validators(request, response, etag, modified)
 
+
+@query_budget(11)
+@use_primary()
 @login_required
 def post_create(request):
     """Страница создания новой публикации."""
@@ -93,6 +199,8 @@ def post_create(request):
     return render(request, 'posts/post_create.html', {'form': form})
 
 
+@query_budget(6)
+@use_primary()
 @login_required
 def post_edit(request, post_id):
     """Страница редактирования публикации."""
@@ -119,6 +227,8 @@ def post_edit(request, post_id):
     )
 
 
+@query_budget(8)
+@use_primary()
 @login_required
 def add_comment(request, post_id):
     """Представление для добавления комментария к публикации."""
@@ -128,25 +238,32 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
 
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
 def follow_index(request):
     """Представление с публикациями любимых авторов."""
-    post_list = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
+    post_list = timeline_posts(request.user).select_related(
+        'author', 'group',
+    ).with_engagement(request.user).prefetch_related('image_variants')
     page_obj = paginate(request, post_list, POSTS_MAX)
     context = {
         'page_obj': page_obj,
+        'feed_version': caching.feed_version(
+            caching.INDEX, caching.user_scope(request.user.pk),
+        ),
     }
 
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(15)
+@use_primary()
 @login_required
 def profile_follow(request, username):
     """Представление для подписки на автора."""
@@ -157,6 +274,8 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(11)
+@use_primary()
 @login_required
 def profile_unfollow(request, username):
     """Представление для отписки от автора."""
@@ -166,6 +285,7 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(4)
 @login_required
 def user_account(request, username):
     """Страница профиля пользователя."""
@@ -173,21 +293,70 @@ def user_account(request, username):
     context = {
         'user_pr': user_pr,
     }
+    if user_pr == request.user:
+        context['archive_url'] = archive.ready_archive(user_pr.pk)
 
     return render(request, 'posts/user_account.html', context)
 
 
+# Архив читается из базы кусками уже после выхода из представления:
+# бюджет учитывает только проверку входа.
+@query_budget(2)
+@login_required
+def archive_download(request):
+    """Архив публикаций, комментариев и лайков пользователя потоком."""
+    response = StreamingHttpResponse(
+        archive.archive_chunks(request.user), content_type='application/zip',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.zip"'
+    )
+    return response
+
+
+@query_budget(2)
+@require_POST
+@login_required
+def archive_request(request):
+    """Заказ архива, который соберется в фоне и появится в профиле."""
+    if archive.schedule_archive(request.user.pk):
+        messages.success(
+            request, 'Архив собирается и скоро появится на этой странице.',
+        )
+    else:
+        notice = 'Архив уже заказан недавно.'
+        allowed = archive.next_request_time(request.user.pk)
+        if allowed is not None:
+            notice += (
+                ' Новый можно будет заказать после '
+                f'{timezone.localtime(allowed):%H:%M}.'
+            )
+        messages.warning(request, notice)
+    return redirect('posts:user_account', request.user.username)
+
+
+@method_decorator(use_primary(), name='dispatch')
 class LikeView(LoginRequiredMixin, View):
+    """Переключение лайка публикации. Отвечает новым состоянием."""
+
+    query_budget = 12
+
     def post(self, request, post_id):
-        post = get_object_or_404(Post, id=post_id)
-        if Like.objects.filter(user=request.user, post=post).exists():
-            Like.objects.filter(user=request.user, post=post).delete()
-        else:
-            Like(user=request.user, post=post).save()
+        if likes.enabled():
+            post = get_object_or_404(
+                Post.objects.only('pk', 'likes_count'), id=post_id,
+            )
+            liked, likes_count = likes.toggle(request.user, post)
+            return JsonResponse({'liked': liked, 'likes_count': likes_count})
+        post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+        liked = Like.objects.toggle(request.user, post)
+        post.refresh_from_db(fields=('likes_count',))
 
-        return HttpResponse()
+        return JsonResponse({'liked': liked, 'likes_count': post.likes_count})
 
 
+@query_budget(14)
+@use_primary()
 @login_required
 def post_delete(request, post_id):
     """Страница подтверждения удаления публикации."""
@@ -199,3 +368,76 @@ def post_delete(request, post_id):
 
     return render(request, 'posts/post_delete.html', context)
 
+
+def search_page(request, form, queryset):
+    """Страница найденных публикаций по данным проверенной формы."""
+    data = form.cleaned_data
+    group = data['group']
+    author_id = None
+    if data['author']:
+        author_id = User.objects.filter(
+            username=data['author'],
+        ).values_list('pk', flat=True).first()
+    if data['author'] and author_id is None:
+        post_ids = []
+    else:
+        post_ids = post_search.search(
+            data['q'], author_id, group.pk if group else None,
+        )
+    results = post_search.SearchResults(post_ids, queryset)
+    return Paginator(results, POSTS_MAX).get_page(request.GET.get('page'))
+
+
+@query_budget(8)
+def search(request):
+    """Страница поиска публикаций."""
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        page_obj = search_page(
+            request, form,
+            Post.objects.select_related('author', 'group').with_engagement(
+                request.user,
+            ).prefetch_related('image_variants'),
+        )
+    query_string = request.GET.copy()
+    query_string.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query_string': query_string.urlencode(),
+    }
+
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(5)
+def search_api(request):
+    """Результаты поиска публикаций в JSON."""
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    page_obj = search_page(
+        request, form, Post.objects.select_related('author', 'group'),
+    )
+    results = [
+        {
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date,
+            'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'url': reverse('posts:post_detail', args=(post.pk,)),
+        }
+        for post in page_obj
+    ]
+
+    return JsonResponse(
+        {
+            'count': page_obj.paginator.count,
+            'page': page_obj.number,
+            'num_pages': page_obj.paginator.num_pages,
+            'results': results,
+        },
+        json_dumps_params={'ensure_ascii': False},
+    )
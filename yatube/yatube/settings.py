@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,12 +44,29 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# В режиме отладки каждый запрос проверяется на N+1 и бюджет запросов
+# к базе. Повтор одной формы SQL QUERY_REPEAT_THRESHOLD раз считается N+1.
+if DEBUG:
+    MIDDLEWARE.insert(1, 'core.middleware.QueryInspectorMiddleware')
+QUERY_REPEAT_THRESHOLD = 3
+
+# Метрики процессов сервера суммируются в этом файле раз
+# в METRICS_FLUSH_INTERVAL секунд и отдаются по адресу /metrics.
+# Сборщик передает METRICS_TOKEN в заголовке Authorization: Bearer
+# <токен>; без токена метрики отдаются только при DEBUG.
+METRICS_LOCATION = os.getenv(
+    'METRICS_LOCATION', os.path.join(BASE_DIR, 'metrics.sqlite3'),
+)
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.InstrumentedTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -68,10 +87,39 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite (см. core/sqlite.py).
+# Пустой словарь отключает настройку.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Реплики только для чтения. Локально их изображают копии базы SQLite:
+# DB_REPLICAS=replica1.sqlite3,replica2.sqlite3, а команда sync_replicas
+# копирует в них основную базу. В тестах реплики - зеркала основной базы.
+DATABASE_REPLICAS = []
+replica_names = filter(None, os.getenv('DB_REPLICAS', '').split(','))
+for number, name in enumerate(replica_names):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной базы:
+# с запасом больше отставания реплик.
+REPLICA_PIN_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -113,8 +161,53 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+CURSOR_PAGINATION = False
+
+# Сколько секунд обратный прокси может отдавать гостям закэшированные
+# страницы лент и публикаций (Cache-Control: public, max-age).
+ANONYMOUS_MAX_AGE = 30
+
+# Адрес сайта для абсолютных ссылок в лентах Atom, RSS и JSON Feed:
+# ленты собираются в фоне, без запроса, из которого его можно узнать.
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+
+# Таблицы больше этого числа строк админка не пересчитывает COUNT(*),
+# а показывает оценку.
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BACKFILL = 1000
+TIMELINE_HEAVY_AUTHORS_TIMEOUT = 60 * 10
+
+# Поиск по публикациям: 'fts5' - индекс FTS5 в SQLite, 'index' - обратный
+# индекс в обычной таблице. Без FTS5 всегда используется 'index'.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'fts5')
+
+# Отложенная запись лайков: клики копятся в журнале в кэше и переносятся
+# в базу пачками не чаще раза в LIKE_FLUSH_INTERVAL секунд (и командой
+# flush_likes).
+LIKE_WRITE_BEHIND = os.getenv('LIKE_WRITE_BEHIND', '') == '1'
+LIKE_FLUSH_INTERVAL = 5
+
+# Потоки для фоновых задач, например построения миниатюр.
+# При 0 задачи выполняются сразу в обработчике запроса.
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+
+# По умолчанию кэш общий для всех процессов и хранится в файле SQLite.
+# В продакшене его можно заменить на Redis или Memcached переменными
+# окружения, например CACHE_BACKEND=django_redis.cache.RedisCache
+# и CACHE_LOCATION=redis://127.0.0.1:6379/1.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'core.caching.SQLiteCache'),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3'),
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Тесты работают со своим временным файлом кэша, а не с общим.
+TEST_RUNNER = 'core.runner.IsolatedCacheRunner'
@@ -0,0 +1,50 @@
+"""Настройки продакшена: PostgreSQL, реплики и постоянные соединения.
+
+Включаются переменной DJANGO_SETTINGS_MODULE=yatube.settings_production.
+Основная база задается переменными DB_HOST, DB_PORT, DB_NAME, DB_USER
+и DB_PASSWORD, реплики - списком хостов DB_REPLICA_HOSTS через запятую
+с теми же именем базы и учетной записью.
+"""
+import os
+
+from yatube.settings import *  # noqa: F401,F403
+from yatube.settings import ALLOWED_HOSTS, MIDDLEWARE
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', ','.join(ALLOWED_HOSTS)).split(',')
+
+# Проверка N+1 нужна только при разработке.
+MIDDLEWARE = [
+    name for name in MIDDLEWARE
+    if name != 'core.middleware.QueryInspectorMiddleware'
+]
+
+# Соединение с базой живет между запросами: установка соединения
+# с PostgreSQL дороже большинства запросов страницы.
+CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+
+def postgres(host):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': host,
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'NAME': os.getenv('DB_NAME', 'yatube'),
+        'USER': os.getenv('DB_USER', 'yatube'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {'connect_timeout': 5},
+    }
+
+
+DATABASES = {'default': postgres(os.getenv('DB_HOST', 'localhost'))}
+DATABASE_REPLICAS = []
+replica_hosts = filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))
+for number, host in enumerate(replica_hosts):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {**postgres(host), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+# На PostgreSQL нет FTS5: поиск работает по обратному индексу SearchTerm.
+SEARCH_BACKEND = 'index'